@@ -0,0 +1,326 @@
+"""
+Cohort Analytics - columnar snapshot of quiz results and progress for instructor reports
+quiz_results and user_progress are copied into NumPy column arrays, refreshed incrementally
+from a completed_at / last_accessed watermark and saved to an .npz file between restarts.
+Reports are computed from the arrays on a background thread; requests only read the result.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Bump when the columns change so an old snapshot file is rebuilt instead of loaded
+SNAPSHOT_VERSION = 2
+# Each refresh re-reads rows stamped this long before the watermark: write-behind batches and
+# journal replays commit rows with the time they were accepted, which can be behind the watermark
+WATERMARK_LAG = timedelta(minutes=10)
+SCORE_BINS = 10     # 0-9, 10-19, ..., 90-100
+PASS_SCORE = 60
+FUNNEL_STAGES = (0.25, 0.5, 0.75, 1.0)
+MIN_ATTEMPTS = 5    # topics with fewer quiz attempts are left out of the weakest-topics ranking
+STATUS_CODES = {'not_started': 0, 'in_progress': 1, 'completed': 2}
+
+TABLES = [
+    'CREATE INDEX IF NOT EXISTS idx_quiz_results_completed ON quiz_results (completed_at)',
+    'CREATE INDEX IF NOT EXISTS idx_user_progress_accessed ON user_progress (last_accessed)',
+]
+
+QUIZ_SQL = 'SELECT id, user_id, topic_id, score, completed_at FROM quiz_results WHERE completed_at >= ?'
+PROGRESS_SQL = 'SELECT id, user_id, topic_id, completion_status, score, time_spent, last_accessed FROM user_progress WHERE last_accessed >= ?'
+# A stored semester that isn't a positive integer would break np.bincount, and with it every refresh
+PROFILES_SQL = "SELECT user_id, current_semester FROM student_profiles WHERE typeof(current_semester) = 'integer' AND current_semester > 0"
+
+QUIZ_COLUMNS = {'id': np.int64, 'user_id': np.int64, 'topic_id': np.int64, 'score': np.float32}
+PROGRESS_COLUMNS = {'id': np.int64, 'user_id': np.int64, 'topic_id': np.int64, 'status': np.int8, 'score': np.float32, 'time_spent': np.int64}
+
+
+def _behind(watermark, lag=WATERMARK_LAG):
+    if not watermark: return ''
+    try: return (datetime.fromisoformat(watermark) - lag).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError: return watermark
+
+
+class ColumnTable:
+    """Equal-length NumPy columns kept sorted by the source row id"""
+
+    def __init__(self, dtypes, columns=None):
+        self.dtypes = dtypes
+        self.columns = columns or {name: np.empty(0, dtype) for name, dtype in dtypes.items()}
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def upsert(self, rows):
+        """`rows` are tuples in column order; a row whose id is already present replaces it"""
+        if not rows: return
+        new = {name: np.array(values, dtype=self.dtypes[name]) for name, values in zip(self.dtypes, zip(*rows))}
+        ids = self.columns['id']
+        pos = np.searchsorted(ids, new['id'])
+        found = pos < len(ids)
+        found[found] = ids[pos[found]] == new['id'][found]
+        for name, values in new.items():
+            self.columns[name][pos[found]] = values[found]
+        if found.all(): return
+        fresh = ~found
+        self.columns = {name: np.concatenate([self.columns[name], new[name][fresh]]) for name in self.dtypes}
+        if (np.diff(self.columns['id']) < 0).any():  # rows arrive in watermark order, not id order
+            order = np.argsort(self.columns['id'], kind='stable')
+            self.columns = {name: values[order] for name, values in self.columns.items()}
+
+
+class Snapshot:
+    """
+    Columnar copy of quiz_results and user_progress plus the watermark each was read up to.
+    `source` names the database the rows came from; a saved snapshot only loads for the same one.
+    """
+
+    def __init__(self, source=''):
+        self.source = source
+        self.quizzes = ColumnTable(QUIZ_COLUMNS)
+        self.progress = ColumnTable(PROGRESS_COLUMNS)
+        self.watermarks = {'quizzes': '', 'progress': ''}
+
+    def refresh(self, conn):
+        """Reads rows at or after each watermark (minus the lag). Returns how many rows were read."""
+        read = 0
+        rows = conn.execute(QUIZ_SQL, (_behind(self.watermarks['quizzes']),)).fetchall()
+        if rows:
+            self.quizzes.upsert([(r[0], r[1], r[2], r[3] or 0) for r in rows])
+            self.watermarks['quizzes'] = max(self.watermarks['quizzes'], max(r[4] for r in rows))
+            read += len(rows)
+        rows = conn.execute(PROGRESS_SQL, (_behind(self.watermarks['progress']),)).fetchall()
+        if rows:
+            self.progress.upsert([(r[0], r[1], r[2], STATUS_CODES.get(r[3], 0), r[4] or 0, r[5] or 0) for r in rows])
+            self.watermarks['progress'] = max(self.watermarks['progress'], max(r[6] for r in rows))
+            read += len(rows)
+        return read
+
+    def save(self, path):
+        """Writes an .npz next to `path` and renames it into place, so readers never see a partial file"""
+        tmp = f'{path}.{os.getpid()}.tmp.npz'
+        arrays = {f'quizzes_{k}': v for k, v in self.quizzes.columns.items()}
+        arrays.update({f'progress_{k}': v for k, v in self.progress.columns.items()})
+        arrays.update({f'watermark_{k}': np.array(v) for k, v in self.watermarks.items()})
+        np.savez(tmp, version=np.array(SNAPSHOT_VERSION), source=np.array(self.source), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, source=''):
+        """Snapshot saved by `save`, or an empty one if the file is missing, from another version or another database"""
+        snapshot = cls(source)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != SNAPSHOT_VERSION: return snapshot
+                if str(data['source']) != source:
+                    log.warning('Ignoring analytics snapshot %s: built from %s, not %s', path, data['source'], source)
+                    return snapshot
+                snapshot.quizzes = ColumnTable(QUIZ_COLUMNS, {k: data[f'quizzes_{k}'] for k in QUIZ_COLUMNS})
+                snapshot.progress = ColumnTable(PROGRESS_COLUMNS, {k: data[f'progress_{k}'] for k in PROGRESS_COLUMNS})
+                snapshot.watermarks = {k: str(data[f'watermark_{k}']) for k in snapshot.watermarks}
+        except (OSError, KeyError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError): log.warning('Ignoring analytics snapshot %s: %s', path, e)
+            return cls(source)
+        return snapshot
+
+
+# ==================== REPORTS ====================
+
+def _index(keys, values):
+    """Positions of `values` in the sorted array `keys`, and a mask of the values that are present"""
+    pos = np.searchsorted(keys, values)
+    pos = np.minimum(pos, max(len(keys) - 1, 0))
+    return pos, (keys[pos] == values) if len(keys) else np.zeros(len(values), bool)
+
+
+def _group_percentiles(groups, values, counts, qs):
+    """Nearest-rank percentiles of `values` per group id, for all groups in one sort"""
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    out = {}
+    for q in qs:
+        idx = starts + np.floor(q / 100 * np.maximum(counts - 1, 0)).astype(np.int64)
+        out[q] = np.where(counts > 0, ordered[np.minimum(idx, max(len(ordered) - 1, 0))] if len(ordered) else 0, np.nan)
+    return out
+
+
+def topic_stats(snapshot, topic_ids):
+    """Per-topic quiz score distribution. `topic_ids` is the sorted catalog; returns column arrays aligned with it."""
+    n = len(topic_ids)
+    tix, ok = _index(topic_ids, snapshot.quizzes['topic_id'])
+    tix, scores, users = tix[ok], snapshot.quizzes['score'][ok].astype(np.float64), snapshot.quizzes['user_id'][ok]
+    attempts = np.bincount(tix, minlength=n)
+    sums = np.bincount(tix, weights=scores, minlength=n)
+    passed = np.bincount(tix, weights=scores >= PASS_SCORE, minlength=n)
+    bins = np.clip((scores // (100 // SCORE_BINS)).astype(np.int64), 0, SCORE_BINS - 1)
+    histogram = np.bincount(tix * SCORE_BINS + bins, minlength=n * SCORE_BINS).reshape(n, SCORE_BINS)
+    students = np.bincount(np.unique(users * n + tix) % n, minlength=n) if n else attempts
+    pct = _group_percentiles(tix, scores, attempts, (25, 50, 75))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {'attempts': attempts, 'students': students, 'mean': sums / attempts, 'pass_rate': passed / attempts,
+                'p25': pct[25], 'median': pct[50], 'p75': pct[75], 'histogram': histogram}
+
+
+def semester_funnels(snapshot, topic_ids, topic_semesters, topic_subjects, profiles):
+    """
+    For every semester: students enrolled (current semester), students who started a topic,
+    and students who completed at least each FUNNEL_STAGES share of its topics; plus per subject
+    the students who started it and who completed all of its topics.
+    """
+    p = snapshot.progress
+    tix, ok = _index(topic_ids, p['topic_id'])
+    tix, status, users = tix[ok], p['status'][ok], p['user_id'][ok]
+    user_ids, uix = np.unique(users, return_inverse=True)
+    n_users, n_sem = len(user_ids), int(topic_semesters.max(initial=0)) + 1
+    subject_ids, six = np.unique(topic_subjects, return_inverse=True)
+    n_sub = len(subject_ids)
+    completed = status == STATUS_CODES['completed']
+
+    sem = topic_semesters[tix]
+    started_sem = np.bincount(uix * n_sem + sem, minlength=n_users * n_sem).reshape(n_users, n_sem) > 0
+    done_sem = np.bincount(uix * n_sem + sem, weights=completed, minlength=n_users * n_sem).reshape(n_users, n_sem)
+    topics_per_sem = np.bincount(topic_semesters, minlength=n_sem)
+    sub = six[tix]
+    started_sub = np.bincount(uix * n_sub + sub, minlength=n_users * n_sub).reshape(n_users, n_sub) > 0
+    done_sub = np.bincount(uix * n_sub + sub, weights=completed, minlength=n_users * n_sub).reshape(n_users, n_sub)
+    topics_per_sub = np.bincount(six, minlength=n_sub)
+    enrolled = np.bincount(profiles, minlength=n_sem)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = done_sem / topics_per_sem
+    subject_semester = {int(s): int(topic_semesters[six == i][0]) for i, s in enumerate(subject_ids)}
+    funnels = {}
+    for s in range(1, n_sem):
+        if not topics_per_sem[s]: continue
+        funnels[s] = {
+            'topics': int(topics_per_sem[s]),
+            'enrolled': int(enrolled[s]) if s < len(enrolled) else 0,
+            'started': int(started_sem[:, s].sum()),
+            'completed': {f'{int(f * 100)}%': int((share[:, s] >= f).sum()) for f in FUNNEL_STAGES},
+            'subjects': {int(subject_ids[i]): {'started': int(started_sub[:, i].sum()), 'completed_all': int((done_sub[:, i] >= topics_per_sub[i]).sum())}
+                         for i in range(n_sub) if subject_semester[int(subject_ids[i])] == s},
+        }
+    return funnels
+
+
+def _number(value, digits=1):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def build_report(snapshot, cat, profiles):
+    """JSON-ready cohort report from a snapshot and the curriculum catalog"""
+    topics = sorted(cat.topics.values(), key=lambda t: t['id'])
+    topic_ids = np.array([t['id'] for t in topics], dtype=np.int64)
+    topic_subjects = np.array([t['subject_id'] for t in topics], dtype=np.int64)
+    topic_semesters = np.array([cat.subjects[t['subject_id']]['semester'] for t in topics], dtype=np.int64)
+    stats = topic_stats(snapshot, topic_ids)
+    per_topic = []
+    for i, t in enumerate(topics):
+        subject = cat.subjects[t['subject_id']]
+        per_topic.append({
+            'topic_id': t['id'], 'topic': t['name'], 'subject_id': subject['id'], 'subject': subject['name'], 'semester': subject['semester'], 'difficulty': t['difficulty'],
+            'attempts': int(stats['attempts'][i]), 'students': int(stats['students'][i]),
+            'mean_score': _number(stats['mean'][i]), 'median_score': _number(stats['median'][i]), 'p25_score': _number(stats['p25'][i]), 'p75_score': _number(stats['p75'][i]),
+            'pass_rate': _number(stats['pass_rate'][i], 3), 'histogram': stats['histogram'][i].tolist(),
+        })
+    funnels = semester_funnels(snapshot, topic_ids, topic_semesters, topic_subjects, profiles)
+    for funnel in funnels.values():
+        funnel['subjects'] = [{'subject_id': sid, 'subject': cat.subjects[sid]['name'], **counts} for sid, counts in funnel['subjects'].items()]
+    return {'topics': per_topic, 'semesters': funnels}
+
+
+def weakest_topics(report, limit=10, semester=None, min_attempts=MIN_ATTEMPTS):
+    """Lowest mean quiz score first, among topics with enough attempts to be meaningful (unattempted ones last)"""
+    rows = [t for t in report['topics'] if t['attempts'] >= min_attempts and (semester is None or t['semester'] == semester)]
+    return sorted(rows, key=lambda t: (t['mean_score'] is None, t['mean_score'] or 0, -t['attempts']))[:max(limit, 0)]
+
+
+# ==================== ENGINE ====================
+
+class CohortAnalytics:
+    """
+    `connection` is a context manager factory and `catalog(conn)` returns the curriculum;
+    `source` identifies the database, so a snapshot file from another one is not resumed.
+    Every gunicorn worker keeps its own report, but only the process holding the lock
+    next to the snapshot file saves it; the others resume from it when they start.
+    A background thread, started by `start()` when a worker boots or else by the first
+    `report()`, builds the report and then rebuilds it every `refresh_interval` seconds.
+    The request path only reads the latest one and never builds it.
+    """
+
+    def __init__(self, connection, catalog, snapshot_path=None, refresh_interval=60.0, source=''):
+        self.connection = connection
+        self.catalog = catalog
+        self.snapshot_path = snapshot_path
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._report = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._writer_fd = None
+        self.stats = {'refreshes': 0, 'rows_read': 0, 'failed': 0}
+        self.last_refresh = {}
+
+    def start(self):
+        """Starts the refresh thread in this process if it isn't running; the first refresh begins at once"""
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='analytics-refresh', daemon=True)
+                    self._thread.start()
+
+    def report(self):
+        """Latest cohort report, or None while the first one is still being built"""
+        self.start()
+        return self._report
+
+    def refresh(self):
+        with self._lock: self._refresh_locked()
+
+    def _refresh_locked(self):
+        start = time.perf_counter()
+        if self._snapshot is None:
+            self._snapshot = Snapshot.load(self.snapshot_path, self.source) if self.snapshot_path else Snapshot(self.source)
+        with self.connection() as conn:
+            read = self._snapshot.refresh(conn)
+            cat = self.catalog(conn)
+            profiles = np.array([r[1] for r in conn.execute(PROFILES_SQL)], dtype=np.int64)
+        report = build_report(self._snapshot, cat, profiles)
+        if read and self.snapshot_path and self._owns_snapshot(): self._snapshot.save(self.snapshot_path)
+        self.last_refresh = {
+            'at': datetime.now().isoformat(timespec='seconds'), 'seconds': round(time.perf_counter() - start, 4), 'rows_read': read,
+            'quiz_rows': len(self._snapshot.quizzes), 'progress_rows': len(self._snapshot.progress), 'watermarks': dict(self._snapshot.watermarks),
+        }
+        self._report = report
+        self.stats['refreshes'] += 1
+        self.stats['rows_read'] += read
+
+    def _owns_snapshot(self):
+        """True in the one process that saves the snapshot file; it keeps the lock until it exits"""
+        if self._writer_fd is None:
+            fd = os.open(f'{self.snapshot_path}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            try: fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._writer_fd = fd
+        return True
+
+    def _run(self):
+        while True:
+            try: self.refresh()
+            except Exception as e:
+                self.stats['failed'] += 1
+                log.error('Analytics refresh failed: %s', e)
+            time.sleep(self.refresh_interval)
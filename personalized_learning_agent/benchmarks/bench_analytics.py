@@ -0,0 +1,86 @@
+"""
+Benchmark - cohort reports from the columnar snapshot versus the same aggregates run as SQL
+on the live database. Seeds --users students, times a full snapshot build, an incremental
+refresh after new quiz results, and report computation; checks the numbers against SQL.
+
+    python benchmarks/bench_analytics.py --users 10000
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import seed  # noqa: E402
+
+SQL_TOPICS = 'SELECT topic_id, COUNT(*), AVG(score), SUM(score >= 60), COUNT(DISTINCT user_id) FROM quiz_results GROUP BY topic_id'
+SQL_FUNNEL = '''SELECT s.semester, COUNT(*) FROM (SELECT up.user_id, s.semester, SUM(up.completion_status = 'completed') AS done
+    FROM user_progress up JOIN topics t ON up.topic_id = t.id JOIN subjects s ON t.subject_id = s.id GROUP BY up.user_id, s.semester) s
+    JOIN (SELECT s.semester, COUNT(*) AS total FROM topics t JOIN subjects s ON t.subject_id = s.id GROUP BY s.semester) n ON n.semester = s.semester
+    WHERE s.done * 2 >= n.total GROUP BY s.semester'''
+
+
+def timed(fn, runs=1):
+    start = time.perf_counter()
+    for _ in range(runs): result = fn()
+    return result, (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--new-quizzes', type=int, default=2000, help='quiz results added before the incremental refresh')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_analytics_')
+    with contextlib.redirect_stdout(sys.stderr): seeded = seed(os.path.join(tmp, 'bench.db'), args.users, random.Random(1))
+    import analytics
+    import app as learning_app
+    flask_app = learning_app.create_app({'DATABASE': os.path.join(tmp, 'bench.db'), 'INGEST_WRITE_BEHIND': False, 'AI_RATE_LIMIT_FILE': '', 'ANALYTICS_SNAPSHOT': ''})
+    pool, curriculum = flask_app.extensions['db_pool'], flask_app.extensions['curriculum']
+    print(f'seeded {args.users} students: {seeded["progress_rows"]} progress rows, {seeded["quiz_rows"]} quiz results')
+
+    engine = analytics.CohortAnalytics(pool.connection, curriculum.get, snapshot_path=os.path.join(tmp, 'snapshot.npz'))
+    _, build = timed(engine.refresh)
+    print(f'full snapshot build + report    {build * 1000:9.1f} ms  ({engine.last_refresh["rows_read"]} rows)')
+
+    with pool.connection() as conn:
+        topic_ids = [r[0] for r in conn.execute('SELECT id FROM topics')]
+        conn.executemany('INSERT INTO quiz_results (user_id, topic_id, score, total_questions, time_taken, accuracy) VALUES (?, ?, ?, 5, 60, ?)',
+                         [(random.randint(1, args.users), random.choice(topic_ids), s, s) for s in (random.choice([0, 20, 40, 60, 80, 100]) for _ in range(args.new_quizzes))])
+        conn.commit()
+    _, incremental = timed(engine.refresh)
+    print(f'incremental refresh + report    {incremental * 1000:9.1f} ms  ({engine.last_refresh["rows_read"]} rows, lag window included)')
+
+    snapshot = engine._snapshot
+    with pool.connection() as conn:
+        cat = curriculum.get(conn)
+        profiles = analytics.np.array([r[1] for r in conn.execute(analytics.PROFILES_SQL)])
+        report, compute = timed(lambda: analytics.build_report(snapshot, cat, profiles), args.runs)
+        print(f'report from snapshot            {compute * 1000:9.1f} ms')
+        (sql_topics, sql_funnel), sql = timed(lambda: (conn.execute(SQL_TOPICS).fetchall(), conn.execute(SQL_FUNNEL).fetchall()), args.runs)
+        print(f'same aggregates as live SQL     {sql * 1000:9.1f} ms  (topic stats + 50% funnel only)')
+        _, loaded = timed(lambda: analytics.Snapshot.load(engine.snapshot_path), args.runs)
+        print(f'snapshot load from .npz         {loaded * 1000:9.1f} ms  ({os.path.getsize(engine.snapshot_path) / 1e6:.1f} MB)')
+
+    # Compare the unrounded columns; the report rounds scores and rates for display
+    topic_ids = analytics.np.array(sorted(cat.topics), dtype=analytics.np.int64)
+    stats = analytics.topic_stats(snapshot, topic_ids)
+    mismatches = 0
+    for topic_id, attempts, mean, passed, students in sql_topics:
+        i = int(analytics.np.searchsorted(topic_ids, topic_id))
+        if (stats['attempts'][i], stats['students'][i], round(stats['pass_rate'][i] * attempts)) != (attempts, students, passed) or abs(stats['mean'][i] - mean) > 1e-3: mismatches += 1
+    for semester, half in sql_funnel:
+        if report['semesters'][semester]['completed']['50%'] != half: mismatches += 1
+    print('mismatches vs SQL:', mismatches)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark - dashboard first paint: the old request waterfall versus the
+single /api/dashboard/bootstrap call.
+
+Server time per request is measured in-process; --rtt-ms adds a simulated
+browser round trip per request on the critical path.
+
+    LLM_FAKE_LATENCY=1.5 python benchmarks/bench_bootstrap.py --runs 50 --rtt-ms 40
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LLM_BACKEND', 'fake')
+
+import app as learning_app  # noqa: E402
+from bench_db import login_client  # noqa: E402
+
+
+def timed(client, url):
+    start = time.perf_counter()
+    resp = client.get(url)
+    assert resp.status_code == 200, (url, resp.status_code)
+    return time.perf_counter() - start
+
+
+def waterfall(client, rtt):
+    """profile, then subjects -> analytics alongside recommendations and bookmarks (old dashboard.js)"""
+    profile = timed(client, '/api/profile') + rtt
+    subjects_chain = timed(client, '/api/subjects?semester=1') + timed(client, '/api/progress/analytics?semester=1') + 2 * rtt
+    recommendations = timed(client, '/api/recommendations') + rtt
+    bookmarks = timed(client, '/api/bookmarks') + rtt
+    # Recommendations toggle the global loading overlay, so the page isn't usable until they finish
+    return profile + max(subjects_chain, recommendations, bookmarks), 5
+
+
+def bootstrap(client, rtt):
+    first_paint = timed(client, '/api/dashboard/bootstrap') + rtt
+    timed(client, '/api/recommendations')  # deferred, off the first-paint path
+    return first_paint, 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--rtt-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    flask_app = learning_app.create_app({'DATABASE': os.path.join(tempfile.mkdtemp(), 'bench.db'), 'INGEST_WRITE_BEHIND': False, 'AI_RATE_LIMIT_FILE': '', 'ANALYTICS_SNAPSHOT': ''})
+    with flask_app.app_context(): learning_app.init_db()
+    client = login_client(flask_app, 'bootstrap_bench')
+    # A few weak topics so /api/recommendations goes to the model
+    for topic_id in (1, 2, 3):
+        client.post('/api/quiz/submit', json={'topic_id': topic_id, 'answers': [{'is_correct': False}, {'is_correct': True}], 'time_taken': 60})
+
+    rtt = args.rtt_ms / 1000
+    for name, strategy in (('waterfall', waterfall), ('bootstrap', bootstrap)):
+        samples = [strategy(client, rtt) for _ in range(args.runs)]
+        paints = [s[0] * 1000 for s in samples]
+        print(f'{name:<10} requests={samples[0][1]}  first paint p50={statistics.median(paints):8.2f} ms  max={max(paints):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark - requests/sec on the read/write endpoints with per-request
+connections (the old get_db) versus the pooled, WAL-tuned access layer.
+
+    LLM_BACKEND=fake python benchmarks/bench_db.py --threads 8 --requests 300
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LLM_BACKEND', 'fake')
+
+import app as learning_app  # noqa: E402
+import db  # noqa: E402
+
+ENDPOINTS = [
+    ('GET', '/api/profile', None),
+    ('GET', '/api/subjects?semester=2', None),
+    ('GET', '/api/subjects/4/topics', None),
+    ('GET', '/api/topics/1/resources', None),
+    ('GET', '/api/progress/analytics', None),
+    ('GET', '/api/bookmarks', None),
+    ('POST', '/api/progress/update', {'topic_id': 2, 'status': 'in_progress', 'time_spent': 30}),
+    ('POST', '/api/quiz/submit', {'topic_id': 1, 'answers': [{'is_correct': True}, {'is_correct': False}], 'time_taken': 60}),
+]
+
+
+def login_client(flask_app, name):
+    client = flask_app.test_client()
+    client.post('/register', json={'username': name, 'password': 'pw', 'email': f'{name}@example.com'})
+    client.post('/login', json={'username': name, 'password': 'pw'})
+    return client
+
+
+def run(flask_app, threads, requests_per_thread):
+    clients = [login_client(flask_app, f'bench{threading.get_ident()}_{i}_{time.time_ns()}') for i in range(threads)]
+
+    def worker(client):
+        for i in range(requests_per_thread):
+            method, url, body = ENDPOINTS[i % len(ENDPOINTS)]
+            resp = client.get(url) if method == 'GET' else client.post(url, json=body)
+            assert resp.status_code < 400, (url, resp.status_code)
+
+    workers = [threading.Thread(target=worker, args=(c,)) for c in clients]
+    start = time.perf_counter()
+    for w in workers: w.start()
+    for w in workers: w.join()
+    return threads * requests_per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=300, help='requests per thread')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    flask_app = learning_app.create_app({'DATABASE': path, 'INGEST_WRITE_BEHIND': False, 'AI_RATE_LIMIT_FILE': '', 'ANALYTICS_SNAPSHOT': ''})
+    modes = {
+        'per-request connect': db.ConnectionPool(path, size=0, pragmas=()),
+        'pooled + WAL': db.ConnectionPool(path, size=args.threads),
+    }
+    flask_app.extensions['db_pool'] = modes['per-request connect']
+    with flask_app.app_context(): learning_app.init_db()
+
+    for name, pool in modes.items():
+        flask_app.extensions['db_pool'] = pool
+        rps = run(flask_app, args.threads, args.requests)
+        print(f'{name:<22} {rps:8.1f} req/s')
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
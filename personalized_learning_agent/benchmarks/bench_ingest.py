@@ -0,0 +1,76 @@
+"""
+Benchmark - writes/sec for progress pings and quiz submissions with one commit
+per request versus the journaled write-behind path (timed until everything is committed).
+
+    LLM_BACKEND=fake python benchmarks/bench_ingest.py --threads 16 --requests 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LLM_BACKEND', 'fake')
+
+import app as learning_app  # noqa: E402
+import db  # noqa: E402
+import ingest  # noqa: E402
+from bench_db import login_client  # noqa: E402
+
+
+def run(flask_app, threads, requests_per_thread, quiz_every):
+    clients = [login_client(flask_app, f'ingest{i}_{time.time_ns()}') for i in range(threads)]
+
+    def worker(client):
+        for i in range(requests_per_thread):
+            if quiz_every and i % quiz_every == 0:
+                resp = client.post('/api/quiz/submit', json={'topic_id': 1 + i % 5, 'answers': [{'is_correct': True}, {'is_correct': False}], 'time_taken': 60})
+            else:
+                resp = client.post('/api/progress/update', json={'topic_id': 1 + i % 5, 'status': 'in_progress', 'time_spent': i})
+            assert resp.status_code < 400, resp.status_code
+
+    workers = [threading.Thread(target=worker, args=(c,)) for c in clients]
+    start = time.perf_counter()
+    for w in workers: w.start()
+    for w in workers: w.join()
+    ingestor = flask_app.extensions['ingestor']
+    if ingestor is not None: assert ingestor.flush(timeout=60)
+    return threads * requests_per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500, help='requests per thread')
+    parser.add_argument('--quiz-every', type=int, default=10, help='every Nth request is a quiz submission (0: pings only)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    flask_app = learning_app.create_app({'DATABASE': os.path.join(tmp, 'bench.db'), 'INGEST_WRITE_BEHIND': False, 'AI_RATE_LIMIT_FILE': '', 'ANALYTICS_SNAPSHOT': ''})
+    pool = db.ConnectionPool(flask_app.config['DATABASE'], size=args.threads)
+    flask_app.extensions['db_pool'] = pool
+    with flask_app.app_context(): learning_app.init_db()
+    flask_app.extensions['recommender'].request_refresh = lambda user_id: False  # keep model work out of the measurement
+
+    modes = {
+        'commit per request': None,
+        'write-behind': ingest.WriteBehind(pool.connection, os.path.join(tmp, 'events')),
+    }
+    for name, ingestor in modes.items():
+        flask_app.extensions['ingestor'] = ingestor
+        wps = run(flask_app, args.threads, args.requests, args.quiz_every)
+        print(f'{name:<20} {wps:8.1f} writes/s')
+        if ingestor is not None:
+            print(f'{"":<20} {ingestor.stats}')
+            ingestor.close()
+    with pool.connection() as conn:
+        drift = learning_app.rollups.verify(conn)
+    print('rollup drift:', len(drift))
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark - next-topic ranking for every student: the old per-user LIMIT 5 query versus the
+vectorized batch recommender, per-request cost with and without a stored result, and batch
+scoring against a synthetic catalog much larger than the sample curriculum.
+
+    python benchmarks/bench_next_topics.py --users 10000 --catalog-topics 2000
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import seed  # noqa: E402
+
+OLD_SQL = 'SELECT t.*, s.name as subject_name, s.semester FROM topics t JOIN subjects s ON t.subject_id = s.id LEFT JOIN user_progress up ON t.id = up.topic_id AND up.user_id = ? WHERE (up.id IS NULL OR up.completion_status != "completed") AND s.semester = ? ORDER BY t.order_index ASC LIMIT 5'
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def synthetic_catalog(topics, rng):
+    """Catalog-shaped object with `topics` topics in 10-topic subjects across 8 semesters"""
+    subjects = {s: {'id': s, 'name': f'Subject {s}', 'semester': 1 + s % 8} for s in range(1, topics // 10 + 2)}
+    rows = {t: {'id': t, 'subject_id': 1 + (t - 1) // 10, 'name': f'Topic {t}', 'difficulty': rng.choice(['beginner', 'intermediate', 'advanced']), 'order_index': 1 + (t - 1) % 10} for t in range(1, topics + 1)}
+    edges = [(t, t - 1) for t in rows if rows[t]['order_index'] > 1] + [(t, rng.randint(1, topics)) for t in rng.sample(sorted(rows), topics // 10)]
+    return SimpleNamespace(version=1, subjects=subjects, topics=rows), edges
+
+
+def bench_synthetic(next_topics, np, users, topics, batch_size, rng):
+    cat, edges = synthetic_catalog(topics, rng)
+    model, build = timed(lambda: next_topics.TopicModel(cat, edges))
+    per_user = max(1, topics // 20)
+    rows = np.repeat(np.arange(users), per_user)
+    topic_ids = np.random.default_rng(1).integers(1, topics + 1, len(rows))
+    statuses = np.random.default_rng(2).integers(1, 3, len(rows)).astype(np.int8)
+    scores = np.random.default_rng(3).uniform(20, 100, len(rows)).astype(np.float32)
+    semesters = np.random.default_rng(4).integers(1, 9, users)
+
+    def score_all():
+        for start in range(0, users, batch_size):
+            mine = (rows >= start) & (rows < start + batch_size)
+            n = min(batch_size, users - start)
+            mastery, status = model.mastery(rows[mine] - start, topic_ids[mine], statuses[mine], scores[mine], n)
+            scored, ready = model.score(mastery, status, semesters[start:start + n])
+            model.top(scored, ready, status, semesters[start:start + n])
+    _, elapsed = timed(score_all)
+    print(f'synthetic catalog: {topics} topics, {len(edges)} prerequisite edges, model built in {build * 1000:.1f} ms')
+    print(f'  batch scoring {users} users x {topics} topics   {elapsed:8.2f} s  ({users / elapsed:,.0f} users/s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--catalog-topics', type=int, default=2000, help='topics in the synthetic catalog (0: skip)')
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--sample', type=int, default=1000, help='users timed through the request path')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_next_topics_')
+    with contextlib.redirect_stdout(sys.stderr): seed(os.path.join(tmp, 'bench.db'), args.users, random.Random(1))
+    import numpy as np
+    import app as learning_app
+    import next_topics
+
+    flask_app = learning_app.create_app({'DATABASE': os.path.join(tmp, 'bench.db'), 'INGEST_WRITE_BEHIND': False, 'AI_RATE_LIMIT_FILE': '', 'ANALYTICS_SNAPSHOT': ''})
+    curriculum = flask_app.extensions['curriculum']
+    ranker = next_topics.NextTopics(curriculum.get)
+    with flask_app.extensions['db_pool'].connection() as conn:
+        users = [tuple(r) for r in conn.execute('SELECT user_id, current_semester FROM student_profiles')]
+        print(f'{len(users)} students, {len(curriculum.get(conn).topics)} topics')
+        _, old = timed(lambda: [conn.execute(OLD_SQL, u).fetchall() for u in users])
+        print(f'old query, one per student            {old:8.2f} s')
+        _, scored = timed(lambda: ranker.precompute(conn, args.batch_size, store=False))
+        print(f'batch ranking (scoring only)          {scored:8.2f} s')
+        _, stored = timed(lambda: ranker.precompute(conn, args.batch_size))
+        print(f'batch ranking + store                 {stored:8.2f} s')
+        sample = random.Random(2).sample(users, min(args.sample, len(users)))
+        _, hot = timed(lambda: [ranker.get(conn, u, s) for u, s in sample])
+        ranker.invalidate(conn, [u for u, _ in sample])
+        _, cold = timed(lambda: [ranker.get(conn, u, s) for u, s in sample])
+        print(f'request path, stored result           {hot / len(sample) * 1000:8.3f} ms/user')
+        print(f'request path, after invalidation      {cold / len(sample) * 1000:8.3f} ms/user')
+        print(f'{"":<38} {ranker.stats}')
+    if args.catalog_topics:
+        bench_synthetic(next_topics, np, args.users, args.catalog_topics, args.batch_size, random.Random(3))
+
+
+if __name__ == '__main__':
+    main()
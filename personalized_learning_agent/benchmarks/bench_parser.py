@@ -0,0 +1,120 @@
+"""
+Benchmark - model response parsing over a corpus of well-formed and malformed Gemini
+outputs. Checks how many items llm_parser salvages from each response, then times it
+against the old replace()/json.loads cleanup.
+
+    python benchmarks/bench_parser.py --iterations 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_parser  # noqa: E402
+
+
+def mcq(i, answer=0, **overrides):
+    q = {'id': i, 'question': f'Which statement about JSON parsing #{i} is true?', 'options': [f'Option {c}{i}' for c in 'ABCD'], 'correct_answer': answer}
+    q.update(overrides)
+    return q
+
+
+def rec(kind, priority, message):
+    return {'type': kind, 'priority': priority, 'message': message}
+
+
+QUESTIONS = [mcq(i, i % 4) for i in range(1, 6)]
+QUIZ_JSON = json.dumps(QUESTIONS, indent=2)
+RECS = [rec('revision', 'high', 'Revisit linked lists before the next quiz.'), rec('practice', 'medium', 'Solve five JSON parsing exercises.'), rec('progress', 'low', 'You are improving steadily - keep going!')]
+RECS_JSON = json.dumps(RECS, indent=2)
+
+# (name, kind, response text, items expected to survive, items expected to be rejected)
+CORPUS = [
+    ('bare array', 'quiz', QUIZ_JSON, 5, 0),
+    ('json fence', 'quiz', f'```json\n{QUIZ_JSON}\n```', 5, 0),
+    ('plain fence with prose', 'quiz', f'Here are your questions:\n```\n{QUIZ_JSON}\n```\nGood luck!', 5, 0),
+    ('prose before array', 'quiz', f'Sure! {QUIZ_JSON}', 5, 0),
+    ('"json" inside a question', 'quiz', json.dumps([mcq(1, question='What does a json.loads() call return?')] + QUESTIONS[1:]), 5, 0),
+    ('wrapped in an object', 'quiz', json.dumps({'questions': QUESTIONS}), 5, 0),
+    ('trailing comma', 'quiz', QUIZ_JSON[:-1].rstrip() + ',\n]', 5, 0),
+    ('truncated mid-item', 'quiz', QUIZ_JSON[:QUIZ_JSON.rindex('{') + 30], 4, 1),
+    ('missing closing bracket', 'quiz', QUIZ_JSON[:-1], 5, 0),
+    ('one item with a syntax error', 'quiz', '[' + ', '.join([json.dumps(q) for q in QUESTIONS[:2]] + ['{"question": "Broken?", "options": ["a" "b"]}'] + [json.dumps(q) for q in QUESTIONS[2:]]) + ']', 5, 1),
+    ('three options', 'quiz', json.dumps(QUESTIONS[:4] + [mcq(5, options=['A', 'B', 'C'])]), 4, 1),
+    ('answer out of range', 'quiz', json.dumps(QUESTIONS[:4] + [mcq(5, answer=4)]), 4, 1),
+    ('answer as letter and text', 'quiz', json.dumps(QUESTIONS[:3] + [mcq(4, answer='C'), mcq(5, answer='Option B5')]), 5, 0),
+    ('empty question text', 'quiz', json.dumps(QUESTIONS[:4] + [mcq(5, question='  ')]), 4, 1),
+    ('duplicate options', 'quiz', json.dumps(QUESTIONS[:4] + [mcq(5, options=['Yes', 'No', 'yes', 'Maybe'])]), 4, 1),
+    ('repeated question', 'quiz', json.dumps(QUESTIONS + [QUESTIONS[0]]), 5, 1),
+    ('refusal', 'quiz', "I'm sorry, I can't help with that.", 0, 0),
+    ('empty', 'quiz', '', 0, 0),
+    ('recommendations', 'recommendations', RECS_JSON, 3, 0),
+    ('recommendations fenced', 'recommendations', f'```json\n{RECS_JSON}\n```', 3, 0),
+    ('recommendation without message', 'recommendations', json.dumps(RECS[:2] + [rec('progress', 'low', '')]), 2, 1),
+    ('unknown type and priority', 'recommendations', json.dumps(RECS[:2] + [rec('motivation', 'urgent', 'Take a short break between topics.')]), 3, 0),
+    ('recommendations truncated', 'recommendations', RECS_JSON[:-40], 2, 1),
+]
+
+PARSERS = {'quiz': llm_parser.parse_quiz, 'recommendations': llm_parser.parse_recommendations}
+
+
+def old_parse(text):
+    """The cleanup both Gemini helpers used before llm_parser"""
+    try: return json.loads(text.strip().replace('```json', '').replace('```', '').replace('json', '').strip())
+    except ValueError: return None
+
+
+def check():
+    failures = 0
+    for name, kind, text, valid, rejected in CORPUS:
+        result = PARSERS[kind](text)
+        ok = (len(result.items), result.rejected) == (valid, rejected)
+        old = old_parse(text)
+        print(f'{"ok" if ok else "FAIL":<5} {name:<32} kept {len(result.items)}/{valid} rejected {result.rejected}/{rejected}   old: {len(old) if isinstance(old, list) else "failed"}')
+        failures += not ok
+    return failures
+
+
+def per_response(fn, texts, iterations, repeat=5):
+    """Best of `repeat` timings, in microseconds per response"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for text in texts: fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best / (iterations * len(texts)) * 1e6
+
+
+def bench(iterations):
+    texts = [text for _, _, text, _, _ in CORPUS]
+    parse = {text: PARSERS[kind] for _, kind, text, _, _ in CORPUS}
+    well_formed = [text for name, _, text, _, _ in CORPUS if name in ('bare array', 'json fence')]
+    # The old cleanup only decoded; llm_parser also validates, normalizes and dedupes every item
+    for label, fn, corpus in (('old replace + json.loads', old_parse, texts),
+                              ('llm_parser extraction', llm_parser.extract_items, texts),
+                              ('llm_parser', lambda text: parse[text](text), texts),
+                              ('old (well-formed)', old_parse, well_formed),
+                              ('extraction (well-formed)', llm_parser.extract_items, well_formed),
+                              ('llm_parser (well-formed)', llm_parser.parse_quiz, well_formed)):
+        print(f'{label:<26} {per_response(fn, corpus, iterations):7.1f} us/response')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    failures = check()
+    print()
+    bench(args.iterations)
+    if failures:
+        print(f'\n{failures} corpus case(s) failed')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
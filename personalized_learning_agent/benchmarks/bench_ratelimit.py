@@ -0,0 +1,128 @@
+"""
+Benchmark - AI rate limiter: cost of one decision, and bursts from many processes sharing one
+bucket file. Each scenario forks --processes workers that fire --requests decisions at once;
+each user's admissions must equal min(requests drawn, bucket size) (no lost updates, nothing over-admitted).
+Finally a student hammers /api/quiz/<topic_id> on cold topics through the app: every response is
+still a 200 quiz, and model calls (theirs plus background refills) stay within the global budget.
+
+    python benchmarks/bench_ratelimit.py --processes 8 --requests 5000
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ratelimit  # noqa: E402
+
+SLOW = 1e-9   # tokens per second: effectively no refill during a run, so admissions are exact
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def burst(limiter, users, requests, seed, barrier, results):
+    rng = random.Random(seed)
+    barrier.wait()
+    admitted, drawn = Counter(), Counter()
+    start = time.perf_counter()
+    for _ in range(requests):
+        user = rng.choice(users) if users else None
+        drawn[user] += 1
+        if limiter.allow(user): admitted[user] += 1
+    results.put((admitted, drawn, time.perf_counter() - start))
+
+
+def run_burst(limiter, processes, requests, users):
+    ctx = multiprocessing.get_context('fork')
+    barrier, results = ctx.Barrier(processes), ctx.Queue()
+    workers = [ctx.Process(target=burst, args=(limiter, users, requests, i, barrier, results)) for i in range(processes)]
+    for w in workers: w.start()
+    outcomes = [results.get() for _ in workers]
+    for w in workers: w.join()
+    admitted = sum((a for a, _, _ in outcomes), Counter())
+    drawn = sum((d for _, d, _ in outcomes), Counter())
+    per_decision = sum(t for _, _, t in outcomes) / (processes * requests)
+    return admitted, drawn, per_decision
+
+
+def scenario(name, path, processes, requests, users, expect, **buckets):
+    """
+    Runs one burst and compares admissions with `expect(admitted, drawn)`, both counts per user
+    (a user drawn fewer times than their bucket holds is admitted every time); True when they match
+    """
+    if os.path.exists(path): os.remove(path)
+    admitted, drawn, per_decision = run_burst(ratelimit.RateLimiter(path, **buckets), processes, requests, users)
+    ok = expect(admitted, drawn)
+    print(f'{name:<44} {sum(admitted.values()):>6} admitted of {processes * requests:<7} {per_decision * 1e6:6.1f} us/decision  {"ok" if ok else "MISMATCH"}')
+    return ok
+
+
+def app_burst(tmp, topics, hits, user_burst, global_burst):
+    """One logged-in student requests quizzes for cold topics as fast as possible"""
+    import app as learning_app
+    flask_app = learning_app.create_app({'DATABASE': os.path.join(tmp, 'app.db'), 'INGEST_JOURNAL_DIR': os.path.join(tmp, 'events'), 'AI_RATE_LIMIT_FILE': os.path.join(tmp, 'app.ratelimit'),
+                                         'AI_USER_BURST': user_burst, 'AI_GLOBAL_BURST': global_burst, 'LLM_BACKEND': 'fake', 'LOG_LEVEL': 'WARNING', 'ANALYTICS_SNAPSHOT': ''})
+    with flask_app.app_context(): learning_app.init_db()
+    client = flask_app.test_client()
+    client.post('/register', json={'username': 'burst', 'password': 'burst', 'email': 'burst@example.com'})
+    client.post('/login', json={'username': 'burst', 'password': 'burst'})
+    start = time.perf_counter()
+    statuses = Counter(client.get(f'/api/quiz/{topics[i % len(topics)]}').status_code for i in range(hits))
+    services = flask_app.extensions
+    services['quiz_refiller'].join()
+    return statuses, services['limiter'], services['llm'].stats['calls'], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=5000, help='decisions per process')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--burst', type=int, default=5, help='per-user bucket size')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_ratelimit_')
+    path = os.path.join(tmp, 'buckets')
+    limiter = ratelimit.RateLimiter(path, user_rate=2 / 60, user_burst=args.burst, global_rate=120 / 60, global_burst=20)
+    _, elapsed = timed(lambda: [limiter.allow(u) for u in range(1, 50001)])
+    print(f'single process, 50k users                    {elapsed / 50000 * 1e6:6.1f} us/decision  {limiter.stats}')
+
+    users = list(range(1, args.users + 1))
+    total = args.processes * args.requests
+    checks = [
+        scenario('per-user buckets, global off', path, args.processes, args.requests, users,
+                 lambda a, d: all(a[u] == min(d[u], args.burst) for u in users), user_rate=SLOW, user_burst=args.burst, global_rate=0, global_burst=0),
+        scenario('one user from every process', path, args.processes, args.requests, [42],
+                 lambda a, d: a[42] == min(d[42], args.burst), user_rate=SLOW, user_burst=args.burst, global_rate=0, global_burst=0),
+        scenario('global bucket only', path, args.processes, args.requests, None,
+                 lambda a, d: sum(a.values()) == total // 10, user_rate=0, user_burst=0, global_rate=SLOW, global_burst=total // 10),
+        scenario('both: global bucket smaller than demand', path, args.processes, args.requests, users,
+                 # Every request is admitted while both buckets have tokens, so the total is whichever runs out first
+                 lambda a, d: sum(a.values()) == min(args.users, sum(min(d[u], args.burst) for u in users)) and all(a[u] <= min(d[u], args.burst) for u in users), user_rate=SLOW, user_burst=args.burst, global_rate=SLOW, global_burst=args.users),
+    ]
+    # Refill: with a real rate every user's admissions stay within burst + rate * elapsed
+    start = time.time()
+    checks.append(scenario('refilling at 600/min per user', path, args.processes, args.requests, users[:10],
+                           lambda a, d: all(a[u] <= args.burst + 10 * (time.time() - start) + 1 for u in users[:10]), user_rate=10, user_burst=args.burst, global_rate=0, global_burst=0))
+
+    global_burst = 20
+    with contextlib.redirect_stdout(sys.stderr): statuses, app_limiter, calls, elapsed = app_burst(tmp, list(range(1, 40)), 200, args.burst, global_burst)
+    budget = global_burst + elapsed * app_limiter.global_rate
+    print(f'app: 200 quiz requests over 39 cold topics   responses {dict(statuses)}, {calls} model calls (budget {budget:.0f}), limiter {app_limiter.stats}')
+    checks.append(statuses == Counter({200: 200}) and calls <= budget and app_limiter.stats['user_limited'] > 0)
+    sys.exit(0 if all(checks) else 1)
+
+
+if __name__ == '__main__':
+    main()
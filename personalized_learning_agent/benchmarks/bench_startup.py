@@ -0,0 +1,143 @@
+"""
+Benchmark - process startup: time to import the app, resident memory after import, the first
+request, and what the import left running (threads, model SDK). With --workers, also boots
+gunicorn with and without --preload and reports per-worker boot time, RSS and PSS.
+--baseline REF runs the same measurements on REF's app (via git archive) for a before/after.
+
+    python benchmarks/bench_startup.py --baseline HEAD~1 --runs 5 --workers 4
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Older trees build `app` at import, newer ones in create_app(); import_ms covers both steps either way
+PROBE = '''
+import json, sys, threading, time
+start = time.perf_counter()
+import app
+flask_app = getattr(app, 'app', None) or app.create_app()
+imported = time.perf_counter() - start
+rss = next(int(l.split()[1]) for l in open('/proc/self/status') if l.startswith('VmRSS'))
+threads = threading.active_count()
+start = time.perf_counter()
+status = flask_app.test_client().get('/').status_code
+first = time.perf_counter() - start
+print(json.dumps({'import_ms': imported * 1000, 'rss_mb': rss / 1024, 'first_request_ms': first * 1000, 'status': status,
+                  'threads_after_import': threads, 'genai_imported': 'google.generativeai' in sys.modules}))
+'''
+
+# Worker boot time: from gunicorn launch until the worker has loaded the app and is ready to accept
+HOOKS = '''
+import time
+def post_worker_init(worker):
+    with open({path!r}, 'a') as f: f.write(f'{{worker.pid}} {{time.time()}}\\n')
+'''
+
+
+def export(ref, dest):
+    """Extracts the app directory as of git `ref` into dest; returns the app directory"""
+    root = subprocess.check_output(['git', 'rev-parse', '--show-toplevel'], cwd=APP_DIR, text=True).strip()
+    prefix = os.path.relpath(APP_DIR, root)
+    archive = subprocess.run(['git', 'archive', ref, prefix], cwd=root, check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', dest], input=archive, check=True)
+    return os.path.join(dest, prefix)
+
+
+def environment(tmp):
+    return dict(os.environ, DATABASE=os.path.join(tmp, 'startup.db'), INGEST_JOURNAL_DIR=os.path.join(tmp, 'events'),
+                ANALYTICS_SNAPSHOT=os.path.join(tmp, 'analytics.npz'), LLM_BACKEND='fake', SECRET_KEY='startup', LOG_LEVEL='WARNING')
+
+
+def prepare(app_dir, env):
+    code = 'import app\nflask_app = getattr(app, "app", None) or app.create_app()\nwith flask_app.app_context(): app.init_db()'
+    subprocess.run([sys.executable, '-c', code], cwd=app_dir, env=env, check=True, capture_output=True)
+
+
+def probe(app_dir, env, runs):
+    samples = [json.loads(subprocess.run([sys.executable, '-c', PROBE], cwd=app_dir, env=env, check=True, capture_output=True, text=True).stdout.splitlines()[-1]) for _ in range(runs)]
+    return {k: round(statistics.median(s[k] for s in samples), 1) if isinstance(samples[0][k], float) else samples[0][k] for k in samples[0]}
+
+
+def wsgi_target(app_dir):
+    with open(os.path.join(app_dir, 'app.py')) as f: source = f.read()
+    return 'app:app' if re.search(r'^app = ', source, re.M) else 'app:create_app()'
+
+
+def memory(pid):
+    """RSS and PSS in MB; PSS splits pages shared copy-on-write with the master between the processes sharing them"""
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        fields = {line.split(':')[0]: int(line.split()[1]) for line in f if line.split(':')[0] in ('Rss', 'Pss')}
+    return fields['Rss'] / 1024, fields['Pss'] / 1024
+
+
+def gunicorn(app_dir, env, tmp, workers, preload):
+    ready_file = os.path.join(tmp, f'ready-{preload}')
+    hooks = os.path.join(tmp, 'hooks.py')
+    with open(hooks, 'w') as f: f.write(HOOKS.format(path=ready_file))
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', hooks, '--workers', str(workers), '--worker-class', 'gthread', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'] + (['--preload'] if preload else []) + [wsgi_target(app_dir)]
+    start = time.time()
+    server = subprocess.Popen(cmd, cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None: raise RuntimeError('gunicorn exited during startup')
+            ready = open(ready_file).read().split('\n')[:-1] if os.path.exists(ready_file) else []
+            if len(ready) >= workers: break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError('workers did not boot within 60s')
+        time.sleep(0.5)  # let the workers settle before sampling memory
+        boots = [float(line.split()[1]) - start for line in ready]
+        usage = [memory(int(line.split()[0])) for line in ready]
+        master_rss, _ = memory(server.pid)
+        return {'all_workers_ready_s': round(max(boots), 2), 'worker_rss_mb': round(statistics.mean(r for r, _ in usage), 1),
+                'worker_pss_mb': round(statistics.mean(p for _, p in usage), 1), 'master_rss_mb': round(master_rss, 1)}
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def measure(app_dir, runs, workers):
+    tmp = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        env = environment(tmp)
+        prepare(app_dir, env)
+        result = {'process': probe(app_dir, env, runs)}
+        if workers:
+            result['gunicorn'] = {'preload' if preload else 'no_preload': gunicorn(app_dir, env, tmp, workers, preload) for preload in (False, True)}
+        return result
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', help='git ref to measure as well, e.g. HEAD~1')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreter runs per tree (medians reported)')
+    parser.add_argument('--workers', type=int, default=0, help='gunicorn workers to boot (0: skip the gunicorn measurement)')
+    args = parser.parse_args()
+
+    results = {'working tree': measure(APP_DIR, args.runs, args.workers)}
+    if args.baseline:
+        tmp = tempfile.mkdtemp(prefix='bench_startup_ref_')
+        try: results[args.baseline] = measure(export(args.baseline, tmp), args.runs, args.workers)
+        finally: shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
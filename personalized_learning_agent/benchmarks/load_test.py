@@ -0,0 +1,234 @@
+"""
+Load test - concurrent students replaying the dashboard's call mix against the app
+served by gunicorn, with the offline fake model (LLM_BACKEND=fake) standing in for Gemini.
+
+Seeds --users synthetic students with progress and quiz histories into a fresh database,
+starts gunicorn with --workers, runs --clients concurrent sessions for --duration seconds
+and prints p50/p95/p99 per endpoint plus throughput as JSON. Pass --baseline with an
+earlier run's JSON to see the p95 change per endpoint.
+
+    python benchmarks/load_test.py --users 500 --workers 4 --clients 32 --duration 30 --out run.json
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+PASSWORD = 'loadtest'
+
+
+# ==================== SEEDING ====================
+
+def seed(database, users, rng):
+    """Creates the schema, the curriculum and `users` students with progress and quiz histories"""
+    os.environ.setdefault('LLM_BACKEND', 'fake')
+    import app as learning_app
+    from werkzeug.security import generate_password_hash
+
+    # Seeding process: no writer thread, no journal, no token buckets or analytics snapshot
+    flask_app = learning_app.create_app({'DATABASE': database, 'INGEST_WRITE_BEHIND': False, 'AI_RATE_LIMIT_FILE': '', 'ANALYTICS_SNAPSHOT': ''})
+    with flask_app.app_context(): learning_app.init_db()
+    hashed = generate_password_hash(PASSWORD)  # one scrypt hash shared by every synthetic student
+    now = datetime.now(timezone.utc)
+    with flask_app.extensions['db_pool'].connection() as conn:
+        topics_by_semester = {}
+        for row in conn.execute('SELECT t.id, s.semester FROM topics t JOIN subjects s ON t.subject_id = s.id'):
+            topics_by_semester.setdefault(row['semester'], []).append(row['id'])
+        progress, quizzes = [], []
+        for i in range(users):
+            cursor = conn.execute('INSERT INTO users (username, password, email) VALUES (?, ?, ?)', (f'load{i}', hashed, f'load{i}@example.com'))
+            user_id, semester = cursor.lastrowid, rng.randint(1, 8)
+            conn.execute('INSERT INTO student_profiles (user_id, current_semester, last_active) VALUES (?, ?, DATE("now"))', (user_id, semester))
+            for sem in range(1, semester + 1):
+                current = sem == semester
+                for topic_id in topics_by_semester.get(sem, []):
+                    if rng.random() < (0.5 if current else 0.15): continue
+                    status = 'in_progress' if current and rng.random() < 0.5 else 'completed'
+                    score = rng.triangular(20, 100, 75) if status == 'completed' else 0
+                    progress.append((user_id, topic_id, status, score, rng.randint(60, 7200)))
+                    if status != 'completed': continue
+                    for _ in range(rng.randint(1, 3)):
+                        taken = now - timedelta(days=rng.uniform(0, 60))
+                        quizzes.append((user_id, topic_id, score, 5, rng.randint(60, 300), score, taken.strftime('%Y-%m-%d %H:%M:%S')))
+        conn.executemany('INSERT INTO user_progress (user_id, topic_id, completion_status, score, time_spent, last_accessed) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)', progress)
+        conn.executemany('INSERT INTO quiz_results (user_id, topic_id, score, total_questions, time_taken, accuracy, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?)', quizzes)
+        conn.commit()
+        learning_app.rollups.rebuild(conn)
+        subjects = [dict(r) for r in conn.execute('SELECT id, semester FROM subjects')]
+    return {'topics_by_semester': topics_by_semester, 'subjects': subjects, 'progress_rows': len(progress), 'quiz_rows': len(quizzes)}
+
+
+# ==================== SERVER ====================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(tmp, database, port, workers, threads, llm_latency, llm_jitter):
+    # Journal, token buckets and the analytics snapshot stay in the temp dir, away from the source tree and the dev server
+    env = dict(os.environ, DATABASE=database, INGEST_JOURNAL_DIR=os.path.join(tmp, 'events'), AI_RATE_LIMIT_FILE=os.path.join(tmp, 'load.ratelimit'),
+               ANALYTICS_SNAPSHOT=os.path.join(tmp, 'load.analytics.npz'), LLM_BACKEND='fake', LLM_FAKE_LATENCY=str(llm_latency), LLM_FAKE_JITTER=str(llm_jitter), SECRET_KEY='load-test')
+    cmd = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:create_app()']
+    server = subprocess.Popen(cmd, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None: raise RuntimeError('gunicorn exited during startup')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5): return server
+        except OSError: time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not start listening within 60s')
+
+
+# ==================== LOAD ====================
+
+class Student:
+    """One browser session: cookie jar plus latency samples per endpoint"""
+
+    def __init__(self, base, username, record):
+        self.base, self.username, self.record = base, username, record
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def call(self, name, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method='POST' if data else 'GET', headers={'Content-Type': 'application/json'} if data else {})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                payload = resp.read()
+                ok = resp.status < 400
+        except Exception:
+            payload, ok = b'', False
+        self.record(name, time.perf_counter() - start, ok)
+        return payload
+
+    def json(self, name, path, body=None):
+        payload = self.call(name, path, body)
+        try: return json.loads(payload)
+        except ValueError: return None
+
+    def session(self, rng, seeded):
+        """The dashboard's call sequence: first paint, deferred recommendations, browsing, one quiz"""
+        boot = self.json('GET /api/dashboard/bootstrap', '/api/dashboard/bootstrap') or {}
+        semester = boot.get('semester') or rng.randint(1, 8)
+        self.call('GET /api/recommendations', '/api/recommendations')
+        self.call('GET /api/profile', '/api/profile')
+        self.call('GET /api/subjects', f'/api/subjects?semester={semester}')
+        subjects = [s['id'] for s in seeded['subjects'] if s['semester'] == semester] or [1]
+        self.call('GET /api/subjects/<id>/topics', f'/api/subjects/{rng.choice(subjects)}/topics')
+        topic_id = rng.choice(seeded['topics_by_semester'].get(semester) or [1])
+        self.call('GET /api/topics/<id>/resources', f'/api/topics/{topic_id}/resources')
+        self.call('POST /api/progress/update', '/api/progress/update', {'topic_id': topic_id, 'status': 'in_progress', 'time_spent': rng.randint(60, 3600)})
+        self.call('GET /api/quiz/<id>/stream', f'/api/quiz/{topic_id}/stream')
+        answers = [{'question_id': i + 1, 'selected': 0, 'is_correct': rng.random() < 0.6} for i in range(5)]
+        self.call('POST /api/quiz/submit', '/api/quiz/submit', {'topic_id': topic_id, 'answers': answers, 'time_taken': rng.randint(60, 300)})
+        self.call('GET /api/progress/analytics', f'/api/progress/analytics?semester={semester}')
+
+
+def percentile(sorted_values, q):
+    if not sorted_values: return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))]
+
+
+def run_load(base, seeded, users, clients, duration, rng_seed):
+    samples, lock = {}, threading.Lock()
+
+    def record(name, seconds, ok):
+        with lock:
+            entry = samples.setdefault(name, {'latencies': [], 'errors': 0})
+            entry['latencies'].append(seconds)
+            if not ok: entry['errors'] += 1
+
+    stop_at = time.monotonic() + duration
+    sessions = [0]
+
+    def client_loop(index):
+        rng = random.Random(rng_seed + index)
+        while time.monotonic() < stop_at:
+            student = Student(base, f'load{rng.randrange(users)}', record)
+            student.call('POST /login', '/login', {'username': student.username, 'password': PASSWORD})
+            student.session(rng, seeded)
+            with lock: sessions[0] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints, total = {}, 0
+    for name, entry in sorted(samples.items()):
+        values = sorted(entry['latencies'])
+        total += len(values)
+        endpoints[name] = {
+            'count': len(values), 'errors': entry['errors'],
+            'p50_ms': round(percentile(values, 50) * 1000, 2), 'p95_ms': round(percentile(values, 95) * 1000, 2), 'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'mean_ms': round(sum(values) / len(values) * 1000, 2),
+        }
+    return {'elapsed_s': round(elapsed, 2), 'requests': total, 'sessions': sessions[0], 'throughput_rps': round(total / elapsed, 1), 'endpoints': endpoints}
+
+
+def git_commit():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError: return None
+
+
+def compare(result, baseline):
+    """p95 change per endpoint versus an earlier run"""
+    rows = {}
+    for name, now in result['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before and before['p95_ms']: rows[name] = round(now['p95_ms'] / before['p95_ms'], 3)
+    return {'p95_ratio': rows, 'throughput_ratio': round(result['throughput_rps'] / baseline['throughput_rps'], 3) if baseline.get('throughput_rps') else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200, help='synthetic students to seed')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent simulated students')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of load')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='fake model base latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.5, help='extra random fake model latency in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write the JSON result here as well as to stdout')
+    parser.add_argument('--baseline', help='JSON result of an earlier run to compare against')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='load_test_')
+    database = os.path.join(tmp, 'load.db')
+    seeded = seed(database, args.users, random.Random(args.seed))  # the app logs to stderr; stdout carries only the JSON result
+    port = free_port()
+    server = start_server(tmp, database, port, args.workers, args.threads, args.llm_latency, args.llm_jitter)
+    try:
+        result = run_load(f'http://127.0.0.1:{port}', seeded, args.users, args.clients, args.duration, args.seed)
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    result = {'commit': git_commit(), 'config': {k: v for k, v in vars(args).items() if k not in ('out', 'baseline')}, 'seeded': {'progress_rows': seeded['progress_rows'], 'quiz_rows': seeded['quiz_rows']}, **result}
+    if args.baseline:
+        with open(args.baseline) as f: result['vs_baseline'] = compare(result, json.load(f))
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, 'w') as f: f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Curriculum Catalog - in-process read-through cache of subjects, topics and resources
+Loaded once per worker and indexed by id, subject and semester. Triggers bump
+catalog_meta.version on every change to the curriculum tables; workers compare
+against it (at most every CHECK_INTERVAL seconds) and reload when it moves.
+"""
+
+import threading
+import time
+
+CHECK_INTERVAL = 2.0
+
+TABLES = [
+    'CREATE TABLE IF NOT EXISTS catalog_meta (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 1)',
+] + [
+    f'CREATE TRIGGER IF NOT EXISTS catalog_bump_{table}_{event.lower()} AFTER {event} ON {table} BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END'
+    for table in ('subjects', 'topics', 'learning_resources') for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+
+def read_version(conn):
+    row = conn.execute('SELECT version FROM catalog_meta WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+def bump_version(conn):
+    """For changes the triggers can't see (e.g. a bulk import with triggers dropped). The caller commits."""
+    conn.execute('UPDATE catalog_meta SET version = version + 1 WHERE id = 1')
+
+
+class Catalog:
+    """Immutable snapshot of the curriculum at one version"""
+
+    def __init__(self, conn, version):
+        self.version = version
+        self.subjects = {r['id']: dict(r) for r in conn.execute('SELECT * FROM subjects ORDER BY semester, name')}
+        self.topics = {r['id']: dict(r) for r in conn.execute('SELECT * FROM topics ORDER BY subject_id, order_index')}
+        self.subjects_by_semester, self.topics_by_subject, self.resources_by_topic = {}, {}, {}
+        for s in self.subjects.values():
+            self.subjects_by_semester.setdefault(s['semester'], []).append(s)
+        for t in self.topics.values():
+            self.topics_by_subject.setdefault(t['subject_id'], []).append(t)
+        for r in conn.execute('SELECT * FROM learning_resources ORDER BY id'):
+            self.resources_by_topic.setdefault(r['topic_id'], []).append(dict(r))
+
+    def topic_with_subject(self, topic_id):
+        topic = self.topics.get(topic_id)
+        subject = topic and self.subjects.get(topic['subject_id'])
+        if not subject: return None
+        return {'id': topic['id'], 'name': topic['name'], 'difficulty': topic['difficulty'], 'subject': subject['name']}
+
+
+class CatalogCache:
+    def __init__(self):
+        self._catalog = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, conn):
+        """Current catalog, reloading if another worker (or an admin edit) bumped the version"""
+        catalog, now = self._catalog, time.monotonic()
+        if catalog is not None and now - self._checked_at < CHECK_INTERVAL: return catalog
+        with self._lock:
+            if self._catalog is None or now - self._checked_at >= CHECK_INTERVAL:
+                version = read_version(conn)
+                if self._catalog is None or self._catalog.version != version:
+                    self._catalog = Catalog(conn, version)
+                self._checked_at = now
+            return self._catalog
+
+    def invalidate(self):
+        with self._lock: self._catalog = None
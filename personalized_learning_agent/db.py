@@ -0,0 +1,81 @@
+"""
+Data Access Layer - pooled, pragma-tuned SQLite connections
+Flask requests borrow one connection through get_db() and hand it back on app
+context teardown; background jobs use pool.connection().
+"""
+
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from flask import current_app, g
+
+# WAL lets readers proceed while submit_quiz writes; NORMAL sync is durable under WAL
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 134217728',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+
+
+class ConnectionPool:
+    """Keeps up to `size` idle connections; size=0 disables pooling (one connection per checkout)"""
+
+    def __init__(self, path, size=8, pragmas=PRAGMAS, factory=sqlite3.Connection):
+        self.path = path
+        self.pragmas = pragmas
+        self.factory = factory  # e.g. a sqlite3.Connection subclass that times statements
+        self._idle = queue.LifoQueue(maxsize=size) if size else None
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas: conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        if self._idle is not None:
+            try: return self._idle.get_nowait()
+            except queue.Empty: pass
+        return self._open()
+
+    def release(self, conn):
+        if conn.in_transaction: conn.rollback()
+        if self._idle is not None:
+            try: return self._idle.put_nowait(conn)
+            except queue.Full: pass
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try: yield conn
+        finally: self.release(conn)
+
+    def close_all(self):
+        while self._idle is not None and not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+def get_db():
+    """Connection bound to the current app context, borrowed from current_app's pool"""
+    if '_db_conn' not in g:
+        g._db_pool = current_app.extensions['db_pool']
+        g._db_conn = g._db_pool.acquire()
+    return g._db_conn
+
+
+def close_db(exc=None):
+    conn = g.pop('_db_conn', None)
+    if conn is not None: g.pop('_db_pool').release(conn)
+
+
+def init_app(app, path=None, size=8, factory=sqlite3.Connection, pool=None):
+    """Registers a pool (an existing one, or a new one for `path`) and the per-request connection teardown"""
+    pool = pool or ConnectionPool(path, size, factory=factory)
+    app.extensions['db_pool'] = pool
+    app.teardown_appcontext(close_db)
+    return pool
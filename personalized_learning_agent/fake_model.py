@@ -0,0 +1,62 @@
+"""
+Offline stand-in for genai.GenerativeModel
+Used for tests, quiz bank warm-ups and benchmarks without touching the Gemini API
+"""
+
+import json
+import random
+import re
+import time
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Mimics generate_content() and returns well-formed JSON for the quiz and recommendation prompts"""
+
+    def __init__(self, model_name='fake', latency=0.0, jitter=0.0):
+        self.model_name = model_name
+        self.latency = latency  # seconds slept per call, to load-test slow upstreams offline
+        self.jitter = jitter    # plus up to this many seconds at random, for a realistic latency spread
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        timeout = (request_options or {}).get('timeout')
+        if stream: return self._stream(self._respond(prompt).text, delay, timeout)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f'fake model deadline of {timeout}s exceeded')
+        if delay: time.sleep(delay)
+        return self._respond(prompt)
+
+    def _stream(self, text, delay, timeout=None, chunk_size=40):
+        """Spreads the delay evenly over small chunks, like a streamed model response; the deadline covers the whole stream"""
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for chunk in chunks:
+            if delay: time.sleep(delay / len(chunks))
+            if deadline is not None and time.monotonic() > deadline: raise TimeoutError(f'fake model deadline of {timeout}s exceeded')
+            yield FakeResponse(chunk)
+
+    def _respond(self, prompt):
+        quiz = re.search(r"Create (\d+) multiple-choice questions \(MCQs\) on '(.+?)'", prompt)
+        if quiz:
+            return FakeResponse(json.dumps(self._quiz(int(quiz.group(1)), quiz.group(2))))
+        return FakeResponse(json.dumps([
+            {'type': 'revision', 'priority': 'high', 'message': 'Revise the fundamentals of your weakest topic.'},
+            {'type': 'practice', 'priority': 'medium', 'message': 'Solve ten practice problems every day.'},
+            {'type': 'progress', 'priority': 'low', 'message': 'Move on to the next topic once you score above 60%.'},
+        ]))
+
+    def _quiz(self, count, topic_name):
+        return [{
+            'id': i + 1,
+            'question': f'[{self.calls}.{i + 1}] Which statement about {topic_name} is correct?',
+            'options': [f'Statement {c}' for c in 'ABCD'],
+            'correct_answer': (self.calls + i) % 4,
+        } for i in range(count)]
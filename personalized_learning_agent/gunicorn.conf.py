@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration - production entry point: gunicorn -c gunicorn.conf.py
+The app is built once by create_app() in the master (preload_app) and workers are forked from it.
+The factory opens no database connections, starts no threads and builds no model client, so nothing
+that cannot survive a fork exists yet. Create the schema first: flask --app app init-db
+"""
+
+import os
+import random
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1))
+# Threads absorb requests waiting on the LLM gateway or the SSE quiz stream
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Copy-on-write sharing of the imported modules; set GUNICORN_PRELOAD=0 to import in every worker
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+# Off by default; set GUNICORN_MAX_REQUESTS to recycle each worker after that many requests (jitter keeps them from restarting together)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+
+def post_fork(server, worker):
+    # Forked workers inherit the master's random state; the fake model and quiz sampling should differ per worker
+    random.seed()
+
+
+def post_worker_init(worker):
+    # Build the cohort report in the background as the worker boots, not on the first instructor request.
+    # Each worker keeps its own report; only one of them (whichever takes the file lock first) saves ANALYTICS_SNAPSHOT.
+    worker.wsgi.extensions['cohort'].start()
@@ -0,0 +1,289 @@
+"""
+Event Ingestion - write-behind path for progress pings and quiz submissions
+Requests append the event to a journal segment and return; a writer thread applies
+pending events in one transaction per batch. Repeated progress pings for the same
+(user, topic) collapse into the latest one. Segments are deleted only after their
+batch commits, so events from a crashed process are replayed on the next start.
+An event that fails on its own is moved to a dead-letter file instead of blocking the writer.
+"""
+
+import fcntl
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import rollups
+
+log = logging.getLogger(__name__)
+
+DEAD_LETTER_FILE = 'dead-letter.jsonl'   # in the journal directory; not a segment, so never replayed
+
+# quiz_results.event_id makes replaying a journal that was already applied a no-op
+TABLES = [
+    'ALTER TABLE quiz_results ADD COLUMN event_id TEXT',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_quiz_results_event ON quiz_results (event_id)',
+]
+
+PROGRESS_SQL = "INSERT INTO user_progress (user_id, topic_id, completion_status, time_spent, last_accessed) VALUES (?, ?, ?, ?, ?) ON CONFLICT (user_id, topic_id) DO UPDATE SET completion_status = CASE WHEN user_progress.completion_status = 'completed' THEN 'completed' ELSE excluded.completion_status END, time_spent = excluded.time_spent, last_accessed = excluded.last_accessed"
+QUIZ_SQL = 'INSERT OR IGNORE INTO quiz_results (event_id, user_id, topic_id, score, total_questions, time_taken, accuracy, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+QUIZ_PROGRESS_SQL = 'INSERT INTO user_progress (user_id, topic_id, completion_status, score, last_accessed) VALUES (?, ?, "completed", ?, ?) ON CONFLICT (user_id, topic_id) DO UPDATE SET completion_status = excluded.completion_status, score = excluded.score, last_accessed = excluded.last_accessed'
+
+
+def _now():
+    # Same format as CURRENT_TIMESTAMP, fixed when the event is accepted rather than when it is flushed
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def progress_event(user_id, topic_id, status, time_spent):
+    return {'kind': 'progress', 'user_id': user_id, 'topic_id': topic_id, 'status': status, 'time_spent': time_spent, 'at': _now()}
+
+
+def quiz_event(user_id, topic_id, score, total_questions, time_taken):
+    return {'kind': 'quiz', 'event_id': uuid.uuid4().hex, 'user_id': user_id, 'topic_id': topic_id, 'score': score, 'total_questions': total_questions, 'time_taken': time_taken, 'at': _now()}
+
+
+def _key(event):
+    if event['kind'] == 'progress': return ('progress', event['user_id'], event['topic_id'])
+    return ('quiz', event['event_id'])
+
+
+def _coalesce(previous, event):
+    # Completion is sticky: a later in_progress ping for the same topic must not undo it
+    if event['kind'] == 'progress' and previous['status'] == 'completed': return {**event, 'status': 'completed'}
+    return event
+
+
+def _apply_progress(conn, events):
+    with rollups.tracking_many(conn, [(e['user_id'], e['topic_id']) for e in events]):
+        conn.executemany(PROGRESS_SQL, [(e['user_id'], e['topic_id'], e['status'], e['time_spent'], e['at']) for e in events])
+
+
+def _apply_quiz(conn, event):
+    cursor = conn.execute(QUIZ_SQL, (event['event_id'], event['user_id'], event['topic_id'], event['score'], event['total_questions'], event['time_taken'], event['score'], event['at']))
+    if not cursor.rowcount: return  # already applied before a crash
+    rollups.record_quiz(conn, cursor.lastrowid)
+    with rollups.tracking(conn, event['user_id'], event['topic_id']):
+        conn.execute(QUIZ_PROGRESS_SQL, (event['user_id'], event['topic_id'], event['score'], event['at']))
+
+
+def apply_events(conn, events):
+    """Applies events in order in one transaction: runs of progress pings go through executemany. Commits."""
+    if not conn.in_transaction: conn.execute('BEGIN IMMEDIATE')
+    try:
+        run = []
+        for event in events:
+            if event['kind'] == 'progress':
+                run.append(event)
+                continue
+            if run: _apply_progress(conn, run)
+            run = []
+            _apply_quiz(conn, event)
+        if run: _apply_progress(conn, run)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def read_segment(path):
+    events = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try: events.append(json.loads(line))
+            except ValueError: pass  # torn final line from a crash mid-write
+    return events
+
+
+class WriteBehind:
+    """
+    `connection` is a context manager factory; `on_commit(events)` runs on the writer
+    thread after each batch commits (e.g. to refresh caches that read what was written).
+    """
+
+    def __init__(self, connection, journal_dir, batch_size=500, flush_interval=0.05, max_pending=10000, fsync=False, on_commit=None):
+        self.connection = connection
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.on_commit = on_commit
+        self._pending = {}   # insertion-ordered; a progress ping moves to the end when it replaces an older one
+        self._cond = threading.Condition()
+        self._segment = None
+        self._thread = None
+        self._closed = False
+        self.stats = {'accepted': 0, 'coalesced': 0, 'flushed': 0, 'batches': 0, 'rejected': 0, 'replayed': 0, 'errors': 0, 'dead_lettered': 0}
+
+    # ---- journal segments ----
+
+    def _open_segment(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        path = os.path.join(self.journal_dir, f'{time.time_ns():020d}-{os.getpid()}.journal')
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # Held until the segment is applied and deleted; recovery skips segments a live process still owns
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return path, fd
+
+    def _retire_segment(self, segment):
+        path, fd = segment
+        os.unlink(path)
+        os.close(fd)
+
+    def recover(self):
+        """Replays segments left behind by crashed processes. Returns how many events were applied."""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, '*.journal'))):
+            if self._segment and path == self._segment[0]: continue
+            try: fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError: continue
+            try:
+                try: fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError: continue  # owner is alive
+                if not os.path.exists(path): continue  # owner applied and deleted it meanwhile
+                events = read_segment(path)
+                if events: self._apply(events)
+                os.unlink(path)
+                replayed += len(events)
+            finally:
+                os.close(fd)
+        if replayed:
+            with self._cond: self.stats['replayed'] += replayed
+            log.info('Replayed %d journaled events', replayed)
+        return replayed
+
+    # ---- accepting events ----
+
+    def submit(self, event, timeout=5.0):
+        """
+        Journals the event and queues it for the writer. Blocks while the queue is full
+        and returns False if it is still full after `timeout` seconds.
+        """
+        key = _key(event)
+        line = (json.dumps(event) + '\n').encode()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._closed: return False
+            self._start()
+            while key not in self._pending and len(self._pending) >= self.max_pending:
+                self._cond.notify_all()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['rejected'] += 1
+                    return False
+                self._cond.wait(remaining)
+            if self._segment is None: self._segment = self._open_segment()
+            os.write(self._segment[1], line)
+            if self.fsync: os.fsync(self._segment[1])
+            previous = self._pending.pop(key, None)
+            if previous is not None:
+                self.stats['coalesced'] += 1
+                event = _coalesce(previous, event)
+            self._pending[key] = event
+            self.stats['accepted'] += 1
+            if len(self._pending) >= self.batch_size: self._cond.notify_all()
+        return True
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+            self._thread.start()
+
+    # ---- applying batches ----
+
+    def _apply(self, events):
+        """
+        Commits the events in one transaction. If that fails for anything but a transient database
+        error, commits them one at a time and dead-letters each event that fails on its own.
+        Returns the events that were applied; raises sqlite3.OperationalError for the caller to retry.
+        """
+        try:
+            with self.connection() as conn: apply_events(conn, events)
+            return events
+        except sqlite3.OperationalError: raise
+        except Exception as e:
+            log.warning('Ingest batch of %d events failed (%s); applying them one at a time', len(events), e)
+        # Replaying an event that was already committed is a no-op (upserts, quiz event ids)
+        applied = []
+        for event in events:
+            try:
+                with self.connection() as conn: apply_events(conn, [event])
+                applied.append(event)
+            except sqlite3.OperationalError: raise
+            except Exception as e:
+                self._dead_letter(event, e)
+        return applied
+
+    def _dead_letter(self, event, error):
+        log.error('Dead-lettering event %s: %s', event, error)
+        os.makedirs(self.journal_dir, exist_ok=True)
+        with open(os.path.join(self.journal_dir, DEAD_LETTER_FILE), 'a') as f:
+            f.write(json.dumps({'event': event, 'error': str(error), 'at': _now()}) + '\n')
+        with self._cond: self.stats['dead_lettered'] += 1
+
+    # ---- writer thread ----
+
+    def _take_batch(self):
+        """Swaps out everything pending together with the segment that journaled it"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending: return None, None
+            if len(self._pending) < self.batch_size and not self._closed:
+                self._cond.wait(self.flush_interval)
+            batch, self._pending = list(self._pending.values()), {}
+            segment, self._segment = self._segment, None
+            self._cond.notify_all()
+            return batch, segment
+
+    def _run(self):
+        try: self.recover()
+        except Exception: log.exception('Journal replay failed')
+        while True:
+            batch, segment = self._take_batch()
+            if batch is None: return
+            while True:
+                try:
+                    applied = self._apply(batch)
+                    break
+                except Exception as e:
+                    # Transient (locked, I/O): the batch stays journaled; keep retrying rather than dropping acknowledged events
+                    with self._cond: self.stats['errors'] += 1
+                    log.error('Ingest flush failed, retrying: %s', e)
+                    time.sleep(0.5)
+            if segment: self._retire_segment(segment)
+            with self._cond:
+                self.stats['flushed'] += len(batch)
+                self.stats['batches'] += 1
+                self._cond.notify_all()
+            if self.on_commit and applied:
+                try: self.on_commit(applied)
+                except Exception: log.exception('Ingest on_commit failed')
+
+    def pending(self):
+        with self._cond: return len(self._pending)
+
+    def flush(self, timeout=10.0):
+        """Waits until everything accepted so far is committed (or dead-lettered). Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self.stats['accepted'] - self.stats['coalesced']
+            self._cond.notify_all()
+            while self.stats['flushed'] < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return False
+                self._cond.wait(min(remaining, self.flush_interval))
+        return True
+
+    def close(self, timeout=10.0):
+        """Stops accepting events and drains the queue"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None: self._thread.join(timeout)
@@ -0,0 +1,347 @@
+"""
+Instrumentation - request ids, per-request time breakdown, SQL and LLM metrics
+Metrics are kept per process (one set per gunicorn worker) and served in the Prometheus
+text format on /metrics. Logging goes through the logging module: a disabled level costs
+one level check, and every record carries the id of the request that produced it.
+"""
+
+import contextvars
+import hmac
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as Tally
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from flask.json.provider import DefaultJSONProvider
+
+log = logging.getLogger(__name__)
+sql_log = logging.getLogger('sql')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+# ==================== LOGGING ====================
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        stats = _current.get()
+        record.request_id = stats.request_id if stats else '-'
+        return True
+
+
+def configure_logging(level='INFO'):
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+
+
+# ==================== METRICS REGISTRY ====================
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock: self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock: items = sorted(self._values.items())
+        lines += [f'{self.name}{_format_labels(self.labels, k)} {v}' for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self._values = {}   # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None: row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock: items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), row):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {row[-1]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class Callback:
+    """Metric read at scrape time: `read()` returns a number or {label values tuple: number}"""
+
+    def __init__(self, name, help, kind, read, labels=()):
+        self.name, self.help, self.kind, self.read, self.labels = name, help, kind, read, tuple(labels)
+
+    def render(self):
+        values = self.read()
+        if not isinstance(values, dict): values = {(): values}
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        return lines + [f'{self.name}{_format_labels(self.labels, k)} {v}' for k, v in sorted(values.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def add(self, metric, replace=False):
+        if replace: self._metrics[metric.name] = metric
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        return '\n'.join(line for metric in self._metrics.values() for line in metric.render()) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labels=()):
+    return REGISTRY.add(Counter(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.add(Histogram(name, help, labels, buckets))
+
+
+# Callbacks read a component of the most recently created app, so a later registration replaces an earlier one
+
+def gauge(name, help, read):
+    return REGISTRY.add(Callback(name, help, 'gauge', read), replace=True)
+
+
+def expose_stats(name, help, stats):
+    """Publishes a component's stats dict (monotonic counts) as one counter labelled by event"""
+    return REGISTRY.add(Callback(name, help, 'counter', lambda: {(k,): v for k, v in dict(stats).items()}, ('event',)), replace=True)
+
+
+HTTP_REQUESTS = counter('http_requests_total', 'Requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+HTTP_LATENCY = histogram('http_request_duration_seconds', 'Wall time per request (streamed bodies excluded)', ('endpoint',))
+HTTP_PHASES = histogram('http_request_phase_seconds', 'Time per request spent in the database, waiting on the model and serializing JSON', ('endpoint', 'phase'))
+HTTP_QUERIES = histogram('http_request_queries', 'SQL statements executed per request', ('endpoint',), COUNT_BUCKETS)
+SQL_LATENCY = histogram('sql_statement_duration_seconds', 'Execution time per SQL statement', ('statement',), SQL_BUCKETS)
+SQL_SLOW = counter('sql_slow_statements_total', 'Statements slower than the slow query threshold', ('statement',))
+
+
+# ==================== PER-REQUEST BREAKDOWN ====================
+
+class RequestStats:
+    __slots__ = ('request_id', 'start', 'db', 'queries', 'llm', 'serialize')
+
+    def __init__(self, request_id):
+        self.request_id, self.start = request_id, time.perf_counter()
+        self.db, self.queries, self.llm, self.serialize = 0.0, 0, 0.0, 0.0
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def current():
+    """Breakdown of the request being served on this thread, or None (e.g. background workers)"""
+    return _current.get()
+
+
+@contextmanager
+def timed(phase):
+    """Adds the block's wall time to the current request's `phase` ('llm', 'db' or 'serialize')"""
+    start = time.perf_counter()
+    try: yield
+    finally:
+        stats = _current.get()
+        if stats is not None: setattr(stats, phase, getattr(stats, phase) + time.perf_counter() - start)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'): return super().dumps(obj, **kwargs)
+
+
+# ==================== SQL TIMING ====================
+
+_SPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+_labels = {}
+slow_query_seconds = 0.05
+
+
+def statement_label(sql):
+    """Whitespace-collapsed statement with IN (?, ?, ...) lists folded, so every call site maps to one series"""
+    label = _labels.get(sql)
+    if label is None:
+        label = _PLACEHOLDER_LIST.sub('(?...)', _SPACE.sub(' ', sql).strip())[:160]
+        if len(_labels) < 2000: _labels[sql] = label
+    return label
+
+
+def record_sql(sql, seconds):
+    label = statement_label(sql)
+    SQL_LATENCY.observe(seconds, label)
+    stats = _current.get()
+    if stats is not None:
+        stats.db += seconds
+        stats.queries += 1
+    if seconds >= slow_query_seconds:
+        SQL_SLOW.inc(label)
+        sql_log.warning('slow statement %.1fms: %s', seconds * 1000, label)
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try: return super().execute(sql, parameters)
+        finally: record_sql(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try: return super().executemany(sql, seq_of_parameters)
+        finally: record_sql(sql, time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection factory that times every statement and commit"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try: return super().commit()
+        finally: record_sql('COMMIT', time.perf_counter() - start)
+
+
+# ==================== SAMPLING PROFILER ====================
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds into collapsed-stack (flame graph) lines"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id, self.interval = thread_id, interval
+        self.samples = Tally()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}')
+                frame = frame.f_back
+            if stack: self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+# ==================== FLASK WIRING ====================
+
+# Incoming X-Request-ID values are echoed into logs and headers, so only plain tokens are kept
+REQUEST_ID = re.compile(r'[A-Za-z0-9-]{1,64}')
+
+
+def _token_matches(supplied, token):
+    return bool(token and supplied) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def init_app(app, slow_query_ms=50, profile_dir=None, profile_rate=0.0, profile_token=None, metrics_token=None):
+    """
+    Request ids, breakdown headers and metrics for every route, plus /metrics. With `profile_dir`
+    set, a random `profile_rate` share of requests, and requests sent with `X-Profile: <profile_token>`,
+    are stack-sampled into a server-named .folded file there. With `metrics_token` set, /metrics
+    needs `Authorization: Bearer <metrics_token>`; without it, keep /metrics on an internal address.
+    """
+    global slow_query_seconds
+    slow_query_seconds = slow_query_ms / 1000.0
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request():
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID.fullmatch(request_id): request_id = uuid.uuid4().hex[:16]
+        g._request_stats_token = _current.set(RequestStats(request_id))
+        if profile_dir and (_token_matches(request.headers.get('X-Profile'), profile_token) or (profile_rate and random.random() < profile_rate)):
+            g._sampler = StackSampler(threading.get_ident()).start()
+
+    @app.after_request
+    def finish_request(response):
+        stats = _current.get()
+        if stats is None: return response
+        total = time.perf_counter() - stats.start
+        endpoint = request.endpoint or 'unmatched'
+        HTTP_REQUESTS.inc(endpoint, request.method, response.status_code)
+        HTTP_LATENCY.observe(total, endpoint)
+        for phase in ('db', 'llm', 'serialize'): HTTP_PHASES.observe(getattr(stats, phase), endpoint, phase)
+        HTTP_QUERIES.observe(stats.queries, endpoint)
+        response.headers['X-Request-ID'] = stats.request_id
+        response.headers['Server-Timing'] = f'db;dur={stats.db * 1000:.2f};desc="{stats.queries} queries", llm;dur={stats.llm * 1000:.2f}, serialize;dur={stats.serialize * 1000:.2f}, total;dur={total * 1000:.2f}'
+        sampler = g.pop('_sampler', None)
+        if sampler is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            name = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:12]}.folded'
+            path = os.path.join(profile_dir, name)
+            with open(path, 'w') as f: f.write(sampler.stop())
+            response.headers['X-Profile'] = name
+            log.info('profile for %s %s (request %s) written to %s', request.method, request.path, stats.request_id, path)
+        log.debug('%s %s -> %s in %.1fms (db %.1fms/%d queries, llm %.1fms, serialize %.1fms)', request.method, request.path, response.status_code, total * 1000, stats.db * 1000, stats.queries, stats.llm * 1000, stats.serialize * 1000)
+        return response
+
+    @app.teardown_request
+    def end_request(exc=None):
+        sampler = g.pop('_sampler', None)
+        if sampler is not None: sampler.stop()
+        token = g.pop('_request_stats_token', None)
+        if token is not None: _current.reset(token)
+
+    def metrics():
+        if metrics_token and not _token_matches(request.headers.get('Authorization', '').removeprefix('Bearer '), metrics_token):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+    app.add_url_rule('/metrics', 'metrics', metrics)
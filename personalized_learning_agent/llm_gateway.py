@@ -0,0 +1,150 @@
+"""
+LLM Gateway - shared, non-blocking access to the generative model
+Runs model calls on a bounded thread pool with per-call deadlines (enforced upstream too,
+so a hung call cannot hold a slot), coalesces identical in-flight prompts and sheds load
+once the concurrency cap is reached.
+Callers get None whenever no answer is available and use their own fallbacks.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import instrumentation
+
+log = logging.getLogger(__name__)
+_END = object()
+
+LLM_LATENCY = instrumentation.histogram('llm_call_duration_seconds', 'Upstream model call time (streams: until the last chunk)', ('mode', 'outcome'))
+LLM_TOKENS = instrumentation.counter('llm_tokens_total', 'Model tokens from usage metadata, else estimated at 4 characters per token', ('direction',))
+
+
+def _count_tokens(prompt, text, usage):
+    LLM_TOKENS.inc('prompt', amount=getattr(usage, 'prompt_token_count', None) or len(prompt) // 4)
+    LLM_TOKENS.inc('completion', amount=getattr(usage, 'candidates_token_count', None) or len(text or '') // 4)
+
+
+class LLMGateway:
+    def __init__(self, backend=None, max_concurrency=8, timeout=20.0, backend_factory=None):
+        # With backend_factory the client is built on first use: after a pre-fork import, in the worker that uses it
+        self._backend = backend
+        self._backend_factory = backend_factory
+        self._backend_lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0, 'shed': 0, 'timeouts': 0, 'errors': 0}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None: self._backend = self._backend_factory()
+        return self._backend
+
+    def _request_options(self):
+        # The upstream deadline: without it a hung call keeps its pool thread and in-flight slot forever
+        return {'timeout': self.timeout}
+
+    def _call(self, prompt):
+        start = time.perf_counter()
+        try:
+            response = self.backend.generate_content(prompt, request_options=self._request_options())
+            text = response.text
+        except Exception:
+            LLM_LATENCY.observe(time.perf_counter() - start, 'call', 'error')
+            raise
+        LLM_LATENCY.observe(time.perf_counter() - start, 'call', 'ok')
+        _count_tokens(prompt, text, getattr(response, 'usage_metadata', None))
+        return text
+
+    def _done(self, prompt, future):
+        with self._lock:
+            if self._inflight.get(prompt) is future: del self._inflight[prompt]
+
+    def submit(self, prompt):
+        """Returns a future for `prompt`, sharing one upstream call per identical prompt, or None when shedding"""
+        with self._lock:
+            future = self._inflight.get(prompt)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+            if len(self._inflight) >= self.max_concurrency:
+                self.stats['shed'] += 1
+                return None
+            self.stats['calls'] += 1
+            future = self._executor.submit(self._call, prompt)
+            self._inflight[prompt] = future
+        future.add_done_callback(lambda f: self._done(prompt, f))
+        return future
+
+    def generate(self, prompt, timeout=None):
+        """Blocks for at most `timeout` seconds and returns the response text, or None"""
+        future = self.submit(prompt)
+        if future is None: return None
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            with self._lock: self.stats['timeouts'] += 1
+            return None
+        except Exception as e:
+            with self._lock: self.stats['errors'] += 1
+            log.error('LLM call failed: %s', e)
+            return None
+
+    def _pump(self, prompt, chunks, abandoned):
+        start, parts, last, response = time.perf_counter(), [], None, None
+        try:
+            response = self.backend.generate_content(prompt, stream=True, request_options=self._request_options())
+            for last in response:
+                parts.append(last.text)
+                chunks.put(last.text)
+                if abandoned.is_set(): break
+            LLM_LATENCY.observe(time.perf_counter() - start, 'stream', 'abandoned' if abandoned.is_set() else 'ok')
+            _count_tokens(prompt, ''.join(parts), getattr(last, 'usage_metadata', None))
+        except Exception as e:
+            LLM_LATENCY.observe(time.perf_counter() - start, 'stream', 'error')
+            with self._lock: self.stats['errors'] += 1
+            log.error('LLM stream failed: %s', e)
+        finally:
+            if abandoned.is_set() and hasattr(response, 'close'): response.close()
+            chunks.put(_END)
+
+    def stream(self, prompt, stall_timeout=None, first_chunk_timeout=None):
+        """
+        Yields response text chunks as they arrive. Stops quietly when the stream ends, errors,
+        or is shed at the cap, or when no chunk arrives in time: `first_chunk_timeout` seconds
+        (default: the gateway timeout) for the first one, then `stall_timeout` between chunks.
+        Once the caller stops reading (stall, break or close), the upstream stream is dropped
+        at its next chunk and its slot is released.
+        """
+        chunks, abandoned = queue.Queue(), threading.Event()
+        key = ('stream', id(chunks))
+        with self._lock:
+            if len(self._inflight) >= self.max_concurrency:
+                self.stats['shed'] += 1
+                return
+            self.stats['calls'] += 1
+            future = self._executor.submit(self._pump, prompt, chunks, abandoned)
+            self._inflight[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        # A slow time-to-first-token is not a stall
+        wait = self.timeout if first_chunk_timeout is None else first_chunk_timeout
+        try:
+            while True:
+                try: chunk = chunks.get(timeout=wait)
+                except queue.Empty:
+                    with self._lock: self.stats['timeouts'] += 1
+                    return
+                if chunk is _END: return
+                wait = self.timeout if stall_timeout is None else stall_timeout
+                yield chunk
+        finally:
+            abandoned.set()
+
+    def inflight(self):
+        with self._lock: return len(self._inflight)
@@ -0,0 +1,167 @@
+"""
+LLM Response Parsing - turns raw model text into validated quiz questions and recommendations
+Finds the JSON payload in one pass (markdown fences, prose around it), validates every item
+on its own and keeps the good ones when the rest of the array is malformed or cut off.
+"""
+
+import json
+import re
+from collections import namedtuple
+
+# items: valid, normalized items; rejected: items that failed validation or didn't parse;
+# found: whether the text held any JSON at all (False means a parse failure, not just bad items)
+ParseResult = namedtuple('ParseResult', 'items rejected found')
+
+RECOMMENDATION_TYPES = ('revision', 'practice', 'progress')
+PRIORITIES = ('high', 'medium', 'low')
+_OPENING = re.compile(r'[\[{]')
+_SIGNIFICANT = re.compile(r'["\\{}\[\]]')
+
+
+class JSONObjectStream:
+    """
+    Pulls complete top-level JSON objects out of streamed text (e.g. the items of
+    a JSON array arriving chunk by chunk), so each one can be used as soon as its
+    closing brace arrives. Text outside objects (fences, brackets, commas) is ignored.
+    """
+
+    def __init__(self):
+        self._buf = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.failed = 0   # complete objects that were not valid JSON
+
+    def feed(self, text):
+        """Consumes a chunk and returns the objects it completed (unparseable ones are dropped)"""
+        done = []
+        # Only quotes, backslashes and brackets change state; the regex skips everything in between
+        start = 0 if self._depth else None
+        skip = 1 if self._escaped else 0
+        self._escaped = False
+        for m in _SIGNIFICANT.finditer(text):
+            i = m.start()
+            if i < skip: continue
+            ch = text[i]
+            if self._depth == 0:
+                if ch == '{': start, self._depth = i, 1
+            elif self._in_string:
+                if ch == '\\': skip = i + 2
+                elif ch == '"': self._in_string = False
+            elif ch == '"': self._in_string = True
+            elif ch in '{[': self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buf.append(text[start:i + 1])
+                    try: done.append(json.loads(''.join(self._buf)))
+                    except ValueError: self.failed += 1
+                    self._buf, start = [], None
+        if self._depth:
+            self._buf.append(text[start:])
+            self._escaped = skip > len(text)   # a backslash ended the chunk, so its escaped char starts the next
+        return done
+
+    @property
+    def pending(self):
+        """True while an object has started but not closed (a truncated response ends this way)"""
+        return self._depth > 0
+
+
+def _payload(text):
+    """The JSON part of a response: inside a ``` fence if there is one, from the first [ or { otherwise"""
+    fence = text.find('```')
+    if fence != -1:
+        start = text.find('\n', fence)
+        end = text.find('```', start + 1) if start != -1 else -1
+        if start != -1: text = text[start + 1:end if end != -1 else len(text)]
+    start = _OPENING.search(text)
+    return text[start.start():].strip() if start else None
+
+
+def _unwrap(data):
+    """Accepts a bare array, a single item or an object wrapping the array ({"questions": [...]})"""
+    if isinstance(data, list): return data
+    if isinstance(data, dict):
+        lists = [v for v in data.values() if isinstance(v, list)]
+        if len(lists) == 1 and len(data) == 1: return lists[0]
+        return [data]
+    return []
+
+
+def extract_items(text):
+    """Returns (items, unparseable count, found). Whole-payload json.loads first, object-by-object salvage if that fails."""
+    if not text: return [], 0, False
+    payload = _payload(text)
+    if payload is None: return [], 0, False
+    try:
+        return _unwrap(json.loads(payload)), 0, True
+    except ValueError:
+        pass
+    # Broken array (trailing comma, bad item, truncated output): keep every object that parses on its own
+    scanner = JSONObjectStream()
+    items = scanner.feed(payload)
+    if len(items) == 1 and isinstance(items[0], dict) and not any(k in items[0] for k in ('question', 'message')):
+        items = _unwrap(items[0])
+    return items, scanner.failed + int(scanner.pending), bool(items) or scanner.failed > 0
+
+
+def _answer_index(answer, options):
+    """correct_answer as 0-3; also accepts "2", "C" and the text of the correct option"""
+    if type(answer) is int: return answer if 0 <= answer < 4 else None
+    if isinstance(answer, str):
+        answer = answer.strip()
+        if answer.isdigit(): return _answer_index(int(answer), options)
+        if len(answer) == 1 and answer.upper() in 'ABCD': return 'ABCD'.index(answer.upper())
+        if answer in options: return options.index(answer)
+    return None
+
+
+def normalized(text):
+    """Comparison key for question and message text: case and whitespace don't make an item new"""
+    return ' '.join(text.lower().split())
+
+
+def validate_mcq(q):
+    """Returns a normalized question dict, or None if the model output is unusable"""
+    if not isinstance(q, dict): return None
+    text, options = q.get('question'), q.get('options')
+    if not isinstance(text, str) or not isinstance(options, list) or len(options) != 4: return None
+    text = text.strip()
+    if not text or not all(isinstance(o, str) for o in options): return None
+    options = [o.strip() for o in options]
+    if '' in options or len({o.lower() for o in options}) != 4: return None
+    answer = _answer_index(q.get('correct_answer'), options)
+    if answer is None: return None
+    return {'question': text, 'options': options, 'correct_answer': answer}
+
+
+def validate_recommendation(r):
+    """Returns a normalized recommendation, or None; unknown type/priority fall back to practice/medium"""
+    if not isinstance(r, dict): return None
+    message = r.get('message')
+    if not isinstance(message, str) or not message.strip(): return None
+    kind = r.get('type') if r.get('type') in RECOMMENDATION_TYPES else 'practice'
+    priority = r.get('priority') if r.get('priority') in PRIORITIES else 'medium'
+    return {'type': kind, 'priority': priority, 'message': message.strip()}
+
+
+def _parse(text, validate, key):
+    items, unparseable, found = extract_items(text)
+    valid, seen = [], set()
+    for item in items:
+        item = validate(item)
+        if item is None: continue
+        text = normalized(item[key])
+        if text in seen: continue
+        seen.add(text)
+        valid.append(item)
+    return ParseResult(valid, len(items) - len(valid) + unparseable, found)
+
+
+def parse_quiz(text):
+    return _parse(text, validate_mcq, 'question')
+
+
+def parse_recommendations(text):
+    return _parse(text, validate_recommendation, 'message')
@@ -0,0 +1,122 @@
+"""
+Schema Migrations - versioned, in-order schema changes tracked in PRAGMA user_version
+Each migration runs in its own transaction; add new ones to the end of MIGRATIONS.
+"""
+
+import logging
+import re
+
+import analytics
+import catalog
+import ingest
+import next_topics
+import recommendations
+import rollups
+
+log = logging.getLogger(__name__)
+
+# Keep the newest row per key (what INSERT OR REPLACE was meant to do) before adding UNIQUE indexes
+DEDUPE_USER_PROGRESS = '''DELETE FROM user_progress WHERE id NOT IN (SELECT MAX(id) FROM user_progress GROUP BY user_id, topic_id)'''
+DEDUPE_STUDENT_PROFILES = '''DELETE FROM student_profiles WHERE id NOT IN (SELECT MAX(id) FROM student_profiles GROUP BY user_id)'''
+DEDUPE_BOOKMARKS = '''DELETE FROM bookmarks WHERE id NOT IN (SELECT MIN(id) FROM bookmarks GROUP BY user_id, resource_id)'''
+
+MIGRATIONS = [
+    (1, 'hot path indexes and uniqueness constraints', [
+        DEDUPE_USER_PROGRESS,
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_user_progress_user_topic ON user_progress (user_id, topic_id)',
+        DEDUPE_STUDENT_PROFILES,
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_student_profiles_user ON student_profiles (user_id)',
+        DEDUPE_BOOKMARKS,
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_bookmarks_user_resource ON bookmarks (user_id, resource_id)',
+        'CREATE INDEX IF NOT EXISTS idx_bookmarks_user_created ON bookmarks (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_results_user_completed ON quiz_results (user_id, completed_at)',
+        'CREATE INDEX IF NOT EXISTS idx_topics_subject_order ON topics (subject_id, order_index)',
+        'CREATE INDEX IF NOT EXISTS idx_subjects_semester_name ON subjects (semester, name)',
+        'CREATE INDEX IF NOT EXISTS idx_learning_resources_topic ON learning_resources (topic_id)',
+    ]),
+    (2, 'per-user progress rollups', rollups.TABLES + rollups.REBUILD_SQL),
+    (3, 'curriculum catalog version stamp', catalog.TABLES),
+    (4, 'stored and cohort-shared recommendations', recommendations.TABLES),
+    (5, 'quiz result event ids for journal replay', ingest.TABLES),
+    (6, 'watermark indexes for the analytics snapshot', analytics.TABLES),
+    (7, 'topic prerequisite graph and stored next topics', next_topics.TABLES),
+]
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=None):
+    """Applies every pending migration up to `target` (default: latest). Returns the versions applied."""
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if version <= current_version(conn): continue
+        if target is not None and version > target: break
+        conn.execute('BEGIN')
+        try:
+            for sql in statements: conn.execute(sql)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log.info('Applied migration %d: %s', version, name)
+        applied.append(version)
+    return applied
+
+
+# ==================== QUERY PLAN REGRESSION CHECK ====================
+
+# Every per-user query in app.py; none of them may fall back to a full scan of a per-user table
+USER_TABLES = ('user_progress', 'quiz_results', 'bookmarks', 'student_profiles', 'learning_resources', 'quiz_bank', 'user_subject_rollups', 'user_semester_rollups', 'user_quiz_days', 'user_recommendations', 'cohort_recommendations', 'user_next_topics')
+TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|ORDER\b|GROUP\b)(\w+))?', re.IGNORECASE)
+
+HOT_QUERIES = {
+    'login': ('SELECT * FROM users WHERE username = ?', ('u',)),
+    'profile': ('SELECT sp.*, u.username FROM student_profiles sp JOIN users u ON sp.user_id = u.id WHERE u.id = ?', (1,)),
+    'profile_stats': ('SELECT COALESCE(SUM(completed), 0) as completed_topics, COALESCE(SUM(completed_score_sum) / NULLIF(SUM(completed), 0), 0) as avg_score, COALESCE(SUM(completed_time), 0) as total_time FROM user_semester_rollups WHERE user_id = ?', (1,)),
+    'update_profile': ('UPDATE student_profiles SET current_semester = ? WHERE user_id = ?', (1, 1)),
+    'subjects': ('SELECT subject_id, completed FROM user_subject_rollups WHERE user_id = ?', (1,)),
+    'topics': ('SELECT topic_id, completion_status, score FROM user_progress WHERE user_id = ? AND topic_id IN (?,?,?)', (1, 1, 2, 3)),
+    'catalog_version': ('SELECT version FROM catalog_meta WHERE id = 1', ()),
+    'quiz_bank_sample': ('SELECT question FROM quiz_bank WHERE topic_id = ? AND difficulty = ? AND prompt_version = ?', (1, 'beginner', 1)),
+    'weak_areas': ('SELECT up.topic_id, t.name, s.name as subject_name, up.score FROM user_progress up JOIN topics t ON up.topic_id = t.id JOIN subjects s ON t.subject_id = s.id WHERE up.user_id = ? AND up.score < 60 ORDER BY up.score ASC LIMIT 3', (1,)),
+    'user_recommendations': ('SELECT fingerprint, recommendations FROM user_recommendations WHERE user_id = ?', (1,)),
+    'cohort_recommendations': ('SELECT recommendations FROM cohort_recommendations WHERE fingerprint = ?', ('x',)),
+    'next_topics_stored': (next_topics.STORED_SQL, (1,)),
+    'next_topics_progress': (next_topics.USER_PROGRESS_SQL, (1,)),
+    'next_topics_invalidate': ('DELETE FROM user_next_topics WHERE user_id = ?', (1,)),
+    'semester': ('SELECT current_semester FROM student_profiles WHERE user_id=?', (1,)),
+    'analytics_subjects': ('''SELECT s.name as subject, tc.total_topics, COALESCE(r.completed, 0) as completed, r.score_sum / NULLIF(r.scored_count, 0) as avg_score FROM subjects s JOIN (SELECT subject_id, COUNT(*) as total_topics FROM topics GROUP BY subject_id) tc ON tc.subject_id = s.id LEFT JOIN user_subject_rollups r ON r.subject_id = s.id AND r.user_id = ? WHERE s.semester = ? ORDER BY s.name''', (1, 1)),
+    'analytics_semester': ('SELECT time_spent FROM user_semester_rollups WHERE user_id = ? AND semester = ?', (1, 1)),
+    'analytics_quizzes': ('''SELECT qr.*, t.name as topic_name, s.name as subject_name FROM quiz_results qr JOIN topics t ON qr.topic_id = t.id JOIN subjects s ON t.subject_id = s.id WHERE qr.user_id = ? AND s.semester = ? ORDER BY qr.completed_at DESC LIMIT 5''', (1, 1)),
+    'analytics_trend': ('SELECT date, score_sum / quizzes as avg_score FROM user_quiz_days WHERE user_id = ? AND semester = ? ORDER BY date', (1, 1)),
+    'bookmarks': ('''SELECT lr.*, t.name as topic_name, s.name as subject_name FROM bookmarks b JOIN learning_resources lr ON b.resource_id = lr.id JOIN topics t ON lr.topic_id = t.id JOIN subjects s ON t.subject_id = s.id WHERE b.user_id = ? ORDER BY b.created_at DESC''', (1,)),
+    'analytics_quiz_watermark': (analytics.QUIZ_SQL, ('2024-01-01 00:00:00',)),
+    'analytics_progress_watermark': (analytics.PROGRESS_SQL, ('2024-01-01 00:00:00',)),
+    'remove_bookmark': ('DELETE FROM bookmarks WHERE id = ? AND user_id = ?', (1, 1)),
+}
+
+
+def full_scans(conn, sql, params):
+    """Tables from USER_TABLES that the plan for `sql` reads without an index"""
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[alias or table] = table
+    scans = []
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall():
+        step = row[3].split()
+        if step[0] == 'SCAN' and 'INDEX' not in step:
+            table = aliases.get(step[1], step[1])
+            if table in USER_TABLES: scans.append(table)
+    return scans
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Returns {query name: [scanned tables]} for every query that regressed to a full scan"""
+    failures = {}
+    for name, (sql, params) in queries.items():
+        scans = full_scans(conn, sql, params)
+        if scans: failures[name] = scans
+    return failures
@@ -0,0 +1,269 @@
+"""
+Next-Topic Recommender - ranks every topic in the catalog for a student in one vectorized pass
+Topics are described by feature columns (difficulty, semester, position in subject, subject) and a
+prerequisite matrix; a student is a mastery vector over topics built from user_progress. Results
+are stored per user and recomputed when a quiz result or progress update for that user commits;
+the request path only reads them.
+"""
+
+import json
+import logging
+import threading
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DIFFICULTY = {'beginner': 0.0, 'intermediate': 0.5, 'advanced': 1.0}
+STATUS_CODES = {'not_started': 0, 'in_progress': 1, 'completed': 2}
+COMPLETED_WITHOUT_SCORE = 0.7   # mastery credited for a topic marked completed without a quiz
+IN_PROGRESS_MASTERY = 0.25
+PREREQUISITE_MASTERY = 0.6      # prerequisites at or above this count as mastered
+DEFAULT_ABILITY = 0.3           # a new student is steered towards beginner topics
+ABILITY_PRIOR = 3               # ...and one quiz only moves them part of the way
+LIMIT = 5
+
+# Score weights; every term is in [0, 1]
+W_READY = 3.0       # mean mastery of the topic's prerequisites
+W_CONTINUE = 2.0    # already in progress
+W_SEMESTER = 1.5    # current semester over backlog from earlier ones
+W_DIFFICULTY = 1.0  # difficulty close to the student's demonstrated ability
+W_SUBJECT = 1.0     # subjects the student has already started
+W_ORDER = 0.5       # earlier position in the subject
+BACKLOG_FIT = 0.4   # semester fit of an unfinished topic from an earlier semester
+
+# Subjects whose first topic builds on the last topic of another subject
+SUBJECT_PREREQUISITES = [
+    ('Data Structures', 'Programming in C'),
+    ('Object Oriented Programming (Java)', 'Programming in C'),
+    ('Database Management Systems', 'Data Structures'),
+    ('Operating Systems', 'Data Structures'),
+    ('Artificial Intelligence', 'Data Structures'),
+    ('Web Technologies', 'Object Oriented Programming (Java)'),
+    ('Cloud Computing', 'Operating Systems'),
+    ('Natural Language Processing', 'Artificial Intelligence'),
+    ('Blockchain Technology', 'Database Management Systems'),
+]
+
+
+def as_semester(value):
+    """Older profiles may hold any value in current_semester; anything but a positive integer counts as semester 1"""
+    try: semester = int(value)
+    except (TypeError, ValueError): return 1
+    return semester if semester > 0 else 1
+
+
+def _sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+# Idempotent; run by the migration for existing curricula and after the sample data is inserted
+PREREQUISITE_SQL = [
+    # Within a subject each topic builds on the one before it
+    'INSERT OR IGNORE INTO topic_prerequisites (topic_id, prerequisite_id) SELECT t.id, p.id FROM topics t JOIN topics p ON p.subject_id = t.subject_id AND p.order_index = t.order_index - 1',
+] + [
+    f'''INSERT OR IGNORE INTO topic_prerequisites (topic_id, prerequisite_id) SELECT f.id, l.id FROM subjects s JOIN subjects ps ON ps.name = {_sql_string(pre)}
+        JOIN topics f ON f.subject_id = s.id AND f.order_index = (SELECT MIN(order_index) FROM topics WHERE subject_id = s.id)
+        JOIN topics l ON l.subject_id = ps.id AND l.order_index = (SELECT MAX(order_index) FROM topics WHERE subject_id = ps.id) WHERE s.name = {_sql_string(subject)}'''
+    for subject, pre in SUBJECT_PREREQUISITES
+]
+
+TABLES = [
+    'CREATE TABLE IF NOT EXISTS topic_prerequisites (topic_id INTEGER NOT NULL, prerequisite_id INTEGER NOT NULL, PRIMARY KEY (topic_id, prerequisite_id))',
+    'CREATE TABLE IF NOT EXISTS user_next_topics (user_id INTEGER PRIMARY KEY, catalog_version INTEGER NOT NULL, semester INTEGER NOT NULL, topics TEXT NOT NULL)',
+] + [
+    # The graph is part of the curriculum: editing it bumps the catalog version like the other tables
+    f'CREATE TRIGGER IF NOT EXISTS catalog_bump_topic_prerequisites_{event.lower()} AFTER {event} ON topic_prerequisites BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END'
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+] + PREREQUISITE_SQL
+
+USER_PROGRESS_SQL = 'SELECT topic_id, completion_status, score FROM user_progress WHERE user_id = ?'
+STORED_SQL = 'SELECT catalog_version, semester, topics FROM user_next_topics WHERE user_id = ?'
+PROFILE_SQL = 'SELECT current_semester FROM student_profiles WHERE user_id = ?'
+STORE_SQL = 'INSERT OR REPLACE INTO user_next_topics (user_id, catalog_version, semester, topics) VALUES (?, ?, ?, ?)'
+
+
+class TopicModel:
+    """Topic features and prerequisite matrix for one catalog version, topics ordered by id"""
+
+    def __init__(self, cat, edges):
+        self.version = cat.version
+        topics = sorted(cat.topics.values(), key=lambda t: t['id'])
+        self.ids = np.array([t['id'] for t in topics], dtype=np.int64)
+        n = len(topics)
+        subject_ids, subject = np.unique(np.array([t['subject_id'] for t in topics], dtype=np.int64), return_inverse=True)
+        self.subject = subject
+        self.semester = np.array([cat.subjects[t['subject_id']]['semester'] for t in topics], dtype=np.int64)
+        self.difficulty = np.array([DIFFICULTY.get(t['difficulty'], 0.5) for t in topics], dtype=np.float32)
+        order = np.array([t['order_index'] or 0 for t in topics], dtype=np.float32)
+        last = np.zeros(len(subject_ids), np.float32)
+        np.maximum.at(last, subject, order)
+        self.order = np.where(last[subject] > 1, (order - 1) / np.maximum(last[subject] - 1, 1), 0).astype(np.float32)
+        # prerequisites[t, p] = 1 when p must be learned before t
+        self.prerequisites = np.zeros((n, n), np.float32)
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+        t, t_ok = self.index(edges[:, 0])
+        p, p_ok = self.index(edges[:, 1])
+        self.prerequisites[t[t_ok & p_ok], p[t_ok & p_ok]] = 1
+        self.prerequisite_count = self.prerequisites.sum(axis=1)
+        self.subject_onehot = np.zeros((n, len(subject_ids)), np.float32)
+        self.subject_onehot[np.arange(n), subject] = 1
+
+    def index(self, topic_ids):
+        """Positions of `topic_ids` in the model, and a mask of the ones the catalog knows"""
+        if not len(self.ids): return np.zeros(len(topic_ids), np.int64), np.zeros(len(topic_ids), bool)
+        pos = np.minimum(np.searchsorted(self.ids, topic_ids), len(self.ids) - 1)
+        return pos, self.ids[pos] == topic_ids
+
+    def mastery(self, rows, topic_ids, statuses, scores, n_users):
+        """(n_users x topics) mastery in [0, 1] and status codes from progress rows; `rows` is each row's user position"""
+        tix, ok = self.index(topic_ids)
+        rows, tix, statuses, scores = rows[ok], tix[ok], statuses[ok], scores[ok]
+        status = np.zeros((n_users, len(self.ids)), np.int8)
+        status[rows, tix] = statuses
+        completed = statuses == STATUS_CODES['completed']
+        value = np.where(completed, np.where(scores > 0, scores / 100, COMPLETED_WITHOUT_SCORE), np.where(statuses == STATUS_CODES['in_progress'], IN_PROGRESS_MASTERY, 0))
+        mastery = np.zeros((n_users, len(self.ids)), np.float32)
+        mastery[rows, tix] = np.clip(value, 0, 1)
+        return mastery, status
+
+    def score(self, mastery, status, semesters):
+        """Scores every topic for every user at once; topics that can't be recommended are -inf"""
+        started = status > 0
+        completed = status == STATUS_CODES['completed']
+        has_prereqs = self.prerequisite_count > 0
+        ready = np.where(has_prereqs, (np.minimum(mastery / PREREQUISITE_MASTERY, 1) @ self.prerequisites.T) / np.maximum(self.prerequisite_count, 1), 1)
+        ability = (mastery.sum(axis=1) + DEFAULT_ABILITY * ABILITY_PRIOR) / (started.sum(axis=1) + ABILITY_PRIOR)
+        difficulty_fit = 1 - np.abs(self.difficulty[None, :] - ability[:, None])
+        gap = semesters[:, None] - self.semester[None, :]
+        semester_fit = np.where(gap == 0, 1, BACKLOG_FIT)
+        subject_started = (started.astype(np.float32) @ self.subject_onehot) > 0
+        scores = (W_READY * ready + W_CONTINUE * (status == STATUS_CODES['in_progress']) + W_SEMESTER * semester_fit
+                  + W_DIFFICULTY * difficulty_fit + W_SUBJECT * subject_started[:, self.subject] - W_ORDER * self.order[None, :])
+        return np.where(completed | (gap < 0), -np.inf, scores).astype(np.float32), ready
+
+    def top(self, scores, ready, status, semesters, limit=LIMIT):
+        """Per user: [(topic_id, reason), ...] best first"""
+        k = min(limit, scores.shape[1])
+        if not k: return [[] for _ in range(len(scores))]
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind='stable'), axis=1)
+        rows = np.arange(len(scores))[:, None]
+        valid = np.isfinite(scores[rows, best])
+        reason = np.where(status[rows, best] == STATUS_CODES['in_progress'], 'continue',
+                          np.where(ready[rows, best] < 1, 'prerequisites_pending', np.where(self.semester[best] < semesters[:, None], 'backlog', 'ready')))
+        ids = self.ids[best]
+        return [[(int(ids[u, j]), str(reason[u, j])) for j in range(k) if valid[u, j]] for u in range(len(scores))]
+
+
+class NextTopics:
+    """
+    `catalog(conn)` returns the current curriculum. The model is rebuilt when the catalog
+    version moves; per-user results live in user_next_topics, written by `refresh` and `precompute`.
+    """
+
+    def __init__(self, catalog, limit=LIMIT):
+        self.catalog = catalog
+        self.limit = limit
+        self._model = None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0, 'refreshed': 0, 'precomputed': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock: self.stats[name] += amount
+
+    def model(self, conn):
+        cat = self.catalog(conn)
+        model = self._model
+        if model is None or model.version != cat.version:
+            edges = conn.execute('SELECT topic_id, prerequisite_id FROM topic_prerequisites').fetchall()
+            model = TopicModel(cat, [tuple(e) for e in edges])
+            with self._lock: self._model = model
+        return model
+
+    def _hydrate(self, conn, ranked):
+        cat = self.catalog(conn)
+        out = []
+        for topic_id, reason in ranked:
+            topic = cat.topics.get(topic_id)
+            subject = topic and cat.subjects.get(topic['subject_id'])
+            if subject: out.append({**topic, 'subject_name': subject['name'], 'semester': subject['semester'], 'reason': reason})
+        return out
+
+    def rank(self, conn, user_id, semester):
+        """Scores the full catalog for one user (no caching)"""
+        model = self.model(conn)
+        semester = as_semester(semester)
+        rows = conn.execute(USER_PROGRESS_SQL, (user_id,)).fetchall()
+        topic_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        statuses = np.array([STATUS_CODES.get(r[1], 0) for r in rows], dtype=np.int8)
+        scores = np.array([r[2] or 0 for r in rows], dtype=np.float32)
+        mastery, status = model.mastery(np.zeros(len(rows), np.int64), topic_ids, statuses, scores, 1)
+        semesters = np.array([semester], dtype=np.int64)
+        scored, ready = model.score(mastery, status, semesters)
+        return model, model.top(scored, ready, status, semesters, self.limit)[0]
+
+    def get(self, conn, user_id, semester):
+        """Next topics for the user, from user_next_topics when still valid, else ranked on the spot. Never writes."""
+        model, semester = self.model(conn), as_semester(semester)
+        row = conn.execute(STORED_SQL, (user_id,)).fetchone()
+        if row and row[0] == model.version and row[1] == semester:
+            self._count('hits')
+            return self._hydrate(conn, json.loads(row[2]))
+        self._count('misses')
+        return self._hydrate(conn, self.rank(conn, user_id, semester)[1])
+
+    def refresh(self, conn, user_ids):
+        """Re-ranks and stores results for `user_ids` at their profile semester (after a quiz or progress update). Commits."""
+        user_ids = list(user_ids)
+        if not user_ids: return
+        stored = []
+        for user_id in user_ids:
+            profile = conn.execute(PROFILE_SQL, (user_id,)).fetchone()
+            semester = as_semester(profile[0] if profile else None)
+            model, ranked = self.rank(conn, user_id, semester)
+            stored.append((user_id, model.version, semester, json.dumps(ranked)))
+        conn.executemany(STORE_SQL, stored)
+        conn.commit()
+        self._count('refreshed', len(stored))
+
+    def invalidate(self, conn, user_ids):
+        """Drops stored results, so reads rank on the spot until the next refresh. Commits."""
+        user_ids = list(user_ids)
+        if not user_ids: return
+        conn.executemany('DELETE FROM user_next_topics WHERE user_id = ?', [(u,) for u in user_ids])
+        conn.commit()
+        self._count('invalidated', len(user_ids))
+
+    def precompute(self, conn, batch_size=4096, store=True):
+        """
+        Batch mode: ranks every student with a profile, `batch_size` users per matrix, and
+        stores the results. Returns {user_id: [(topic_id, reason), ...]}.
+        """
+        model = self.model(conn)
+        profiles = conn.execute('SELECT user_id, current_semester FROM student_profiles ORDER BY user_id').fetchall()
+        user_ids = np.array([p[0] for p in profiles], dtype=np.int64)
+        semesters = np.array([as_semester(p[1]) for p in profiles], dtype=np.int64)
+        progress = conn.execute('SELECT user_id, topic_id, completion_status, score FROM user_progress').fetchall()
+        p_users = np.array([r[0] for r in progress], dtype=np.int64)
+        p_topics = np.array([r[1] for r in progress], dtype=np.int64)
+        p_status = np.array([STATUS_CODES.get(r[2], 0) for r in progress], dtype=np.int8)
+        p_scores = np.array([r[3] or 0 for r in progress], dtype=np.float32)
+        # Group progress rows by user so each batch takes a contiguous slice
+        order = np.argsort(p_users, kind='stable')
+        p_users, p_topics, p_status, p_scores = p_users[order], p_topics[order], p_status[order], p_scores[order]
+        results = {}
+        for start in range(0, len(user_ids), batch_size):
+            batch_users, batch_semesters = user_ids[start:start + batch_size], semesters[start:start + batch_size]
+            lo, hi = np.searchsorted(p_users, batch_users[0], side='left'), np.searchsorted(p_users, batch_users[-1], side='right')
+            rows = np.minimum(np.searchsorted(batch_users, p_users[lo:hi]), len(batch_users) - 1)
+            mine = batch_users[rows] == p_users[lo:hi]   # skip progress of users without a profile
+            mastery, status = model.mastery(rows[mine], p_topics[lo:hi][mine], p_status[lo:hi][mine], p_scores[lo:hi][mine], len(batch_users))
+            scored, ready = model.score(mastery, status, batch_semesters)
+            for user_id, ranked in zip(batch_users.tolist(), model.top(scored, ready, status, batch_semesters, self.limit)):
+                results[user_id] = ranked
+        if store:
+            conn.executemany(STORE_SQL, [(u, model.version, int(s), json.dumps(results[u])) for u, s in zip(user_ids.tolist(), semesters.tolist())])
+            conn.commit()
+        self._count('precomputed', len(results))
+        return results
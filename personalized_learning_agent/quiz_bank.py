@@ -0,0 +1,119 @@
+"""
+Quiz Bank - persistent pool of validated AI-generated MCQs
+Quizzes are sampled from the bank; the model is only called to refill a pool that runs low.
+"""
+
+import json
+import logging
+import queue
+import random
+import threading
+
+import llm_parser
+
+log = logging.getLogger(__name__)
+
+# Bump when the quiz prompt changes so old questions stop being served
+PROMPT_VERSION = 1
+QUIZ_SIZE = 5
+REFILL_THRESHOLD = 15   # refill when a pool holds fewer questions than this
+POOL_TARGET = 25        # ...and top it up to this size
+BATCH_SIZE = 10         # questions requested per model call
+MAX_REFILL_CALLS = 4
+
+
+def init_quiz_bank(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS quiz_bank (id INTEGER PRIMARY KEY AUTOINCREMENT, topic_id INTEGER NOT NULL, difficulty TEXT NOT NULL, prompt_version INTEGER NOT NULL, question TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE (topic_id, difficulty, prompt_version, question), FOREIGN KEY (topic_id) REFERENCES topics (id))''')
+    conn.commit()
+
+
+# Kept under its old name; the schema itself lives with the parser
+validate_question = llm_parser.validate_mcq
+
+
+def pool_size(conn, topic_id, difficulty):
+    return conn.execute('SELECT COUNT(*) FROM quiz_bank WHERE topic_id = ? AND difficulty = ? AND prompt_version = ?', (topic_id, difficulty, PROMPT_VERSION)).fetchone()[0]
+
+
+def store_questions(conn, topic_id, difficulty, questions):
+    """Validates and inserts questions, skipping duplicates. Returns how many were added."""
+    rows = []
+    for q in questions or []:
+        q = validate_question(q)
+        if q: rows.append((topic_id, difficulty, PROMPT_VERSION, json.dumps(q, sort_keys=True)))
+    before = conn.total_changes
+    conn.executemany('INSERT OR IGNORE INTO quiz_bank (topic_id, difficulty, prompt_version, question) VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    return conn.total_changes - before
+
+
+def _shuffle_options(q):
+    order = list(range(4))
+    random.shuffle(order)
+    return {'question': q['question'], 'options': [q['options'][i] for i in order], 'correct_answer': order.index(q['correct_answer'])}
+
+
+def sample_quiz(conn, topic_id, difficulty, size=QUIZ_SIZE):
+    """Draws `size` random questions with shuffled options, or None if the pool is too small"""
+    rows = conn.execute('SELECT question FROM quiz_bank WHERE topic_id = ? AND difficulty = ? AND prompt_version = ?', (topic_id, difficulty, PROMPT_VERSION)).fetchall()
+    if len(rows) < size: return None
+    picked = random.sample(rows, size)
+    return [dict(_shuffle_options(json.loads(r[0])), id=i + 1) for i, r in enumerate(picked)]
+
+
+def refill_topic(conn, topic, generate, target=POOL_TARGET):
+    """
+    Tops up the pool for one topic row (needs id, name, subject, difficulty).
+    `generate(topic_name, subject_name, difficulty, count)` is the pluggable model client.
+    """
+    added = 0
+    for _ in range(MAX_REFILL_CALLS):
+        missing = target - pool_size(conn, topic['id'], topic['difficulty'])
+        if missing <= 0: break
+        questions = generate(topic['name'], topic['subject'], topic['difficulty'], min(missing, BATCH_SIZE))
+        if not questions: break
+        added += store_questions(conn, topic['id'], topic['difficulty'], questions)
+    return added
+
+
+def warm_up(conn, generate, target=POOL_TARGET):
+    """Fills the bank for every topic so a fresh deployment never generates on the request path"""
+    topics = conn.execute('SELECT t.id, t.name, t.difficulty, s.name as subject FROM topics t JOIN subjects s ON t.subject_id = s.id ORDER BY t.id').fetchall()
+    return {t['id']: refill_topic(conn, t, generate, target) for t in topics}
+
+
+class QuizBankRefiller:
+    """Background worker that refills low pools one topic at a time"""
+
+    def __init__(self, connection, generate):
+        self.connection = connection  # context manager factory yielding a DB connection
+        self.generate = generate
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def request_refill(self, topic):
+        key = (topic['id'], topic['difficulty'])
+        with self._lock:
+            if key in self._pending: return False
+            self._pending.add(key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quiz-bank-refill', daemon=True)
+                self._thread.start()
+        self._queue.put(dict(topic))
+        return True
+
+    def _run(self):
+        while True:
+            topic = self._queue.get()
+            try:
+                with self.connection() as conn: refill_topic(conn, topic, self.generate)
+            except Exception as e:
+                log.error('Quiz bank refill failed for topic %s: %s', topic['id'], e)
+            finally:
+                with self._lock: self._pending.discard((topic['id'], topic['difficulty']))
+                self._queue.task_done()
+
+    def join(self):
+        self._queue.join()
@@ -0,0 +1,102 @@
+"""
+Rate Limiter - per-user and global token buckets for model calls, shared by every worker process
+Buckets live in a memory-mapped file: slot 0 holds the global bucket, the rest are an open-addressing
+table keyed by user id. A decision locks the file, refills the buckets for the elapsed time and takes
+a token from each, in a few microseconds and without touching the database.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b'TBUCKET1'
+HEADER = struct.Struct('<8sI4x')
+SLOT = struct.Struct('<qdd')   # key (0: empty), tokens, last refill (epoch seconds)
+SLOTS = 65536                  # ~1.5 MB; users beyond this share slots with idle buckets
+PROBES = 16
+GLOBAL = -1
+ANONYMOUS = -2                 # requests without a session share one bucket
+GLOBAL_OFFSET = HEADER.size
+
+
+class RateLimiter:
+    """
+    `user_rate`/`global_rate` are tokens per second and `*_burst` the bucket sizes; a rate of 0
+    turns that bucket off. The file is opened lazily in each process, so a limiter created before
+    gunicorn forks is safe to use in every worker.
+    """
+
+    def __init__(self, path, user_rate, user_burst, global_rate, global_burst, slots=SLOTS):
+        self.path = path
+        self.user_rate, self.user_burst = user_rate, user_burst
+        self.global_rate, self.global_burst = global_rate, global_burst
+        self.slots = slots
+        # A bucket idle this long has refilled completely, so its slot can go to another user
+        self.idle_after = user_burst / user_rate if user_rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self.stats = {'allowed': 0, 'user_limited': 0, 'global_limited': 0, 'evicted': 0}
+
+    def _open(self):
+        size = HEADER.size + self.slots * SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            # New file, or one laid out for another slot count: start from empty (= full) buckets
+            if os.fstat(fd).st_size != size or os.pread(fd, HEADER.size, 0) != HEADER.pack(MAGIC, self.slots):
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, HEADER.pack(MAGIC, self.slots), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        # An inherited descriptor would share the parent's lock, so every process opens its own
+        self._fd, self._map, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+
+    def _user_slot(self, key, now):
+        """Offset of the key's slot, or of a free, idle or (last resort) least recently used one to claim"""
+        start = key * 2654435761 % (self.slots - 1)
+        claim = oldest = None
+        for probe in range(PROBES):
+            offset = GLOBAL_OFFSET + (1 + (start + probe) % (self.slots - 1)) * SLOT.size
+            slot_key, tokens, updated = SLOT.unpack_from(self._map, offset)
+            if slot_key == key: return offset, tokens, updated
+            # Slots never go back to empty, so the key cannot sit past the first empty one
+            if slot_key == 0: return (claim or offset), self.user_burst, now
+            if claim is None and now - updated >= self.idle_after: claim = offset
+            if oldest is None or updated < oldest[1]: oldest = (offset, updated)
+        if claim is None:
+            claim = oldest[0]
+            self.stats['evicted'] += 1
+        return claim, self.user_burst, now
+
+    def allow(self, user_id=None, cost=1.0):
+        """
+        Takes `cost` tokens from the global bucket and, when `user_id` is given, from the user's.
+        Returns False and takes nothing if either is short; the caller serves cached or fallback content.
+        """
+        now = time.time()
+        with self._lock:
+            if self._pid != os.getpid(): self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                buckets = []
+                if self.global_rate > 0:
+                    _, tokens, updated = SLOT.unpack_from(self._map, GLOBAL_OFFSET)
+                    if updated == 0: tokens = self.global_burst
+                    buckets.append((GLOBAL_OFFSET, GLOBAL, min(self.global_burst, tokens + max(0.0, now - updated) * self.global_rate), 'global_limited'))
+                if user_id is not None and self.user_rate > 0:
+                    offset, tokens, updated = self._user_slot(user_id, now)
+                    buckets.append((offset, user_id, min(self.user_burst, tokens + max(0.0, now - updated) * self.user_rate), 'user_limited'))
+                short = next((reason for _, _, tokens, reason in buckets if tokens < cost), None)
+                # Refilled levels are written back either way; tokens are only taken when every bucket had them
+                for offset, key, tokens, _ in buckets:
+                    SLOT.pack_into(self._map, offset, key, tokens if short else tokens - cost, now)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self.stats[short or 'allowed'] += 1
+        return short is None
@@ -0,0 +1,161 @@
+"""
+Recommendation Cache - stored AI recommendations keyed by a fingerprint of their inputs
+The fingerprint covers the weak topics, their bucketed scores and the semester. Reads never
+call the model: a background worker recomputes after a quiz submission, and only when the
+fingerprint moved. Results are shared by every student with the same fingerprint (cohort).
+"""
+
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Bump when the recommendation prompt changes so stored results stop being served
+PROMPT_VERSION = 1
+SCORE_BUCKET = 10   # scores within the same 10 points produce the same advice
+RETRY_AFTER = 30    # seconds before a failed or rate-limited refresh is retried, doubling per failure
+MAX_RETRY_AFTER = 900
+
+TABLES = [
+    'CREATE TABLE IF NOT EXISTS user_recommendations (user_id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL, recommendations TEXT NOT NULL, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+    'CREATE TABLE IF NOT EXISTS cohort_recommendations (fingerprint TEXT PRIMARY KEY, recommendations TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+]
+
+
+def fingerprint(semester, weak_areas):
+    """Stable key for the model's inputs; None when there is nothing to recommend on"""
+    if not weak_areas: return None
+    key = [PROMPT_VERSION, semester, [(w['topic_id'], int((w['score'] or 0) // SCORE_BUCKET)) for w in weak_areas]]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+
+def _user_row(conn, user_id):
+    return conn.execute('SELECT fingerprint, recommendations FROM user_recommendations WHERE user_id = ?', (user_id,)).fetchone()
+
+
+def _cohort(conn, fp):
+    row = conn.execute('SELECT recommendations FROM cohort_recommendations WHERE fingerprint = ?', (fp,)).fetchone()
+    return json.loads(row['recommendations']) if row else None
+
+
+def _store_user(conn, user_id, fp, recommendations):
+    conn.execute('INSERT INTO user_recommendations (user_id, fingerprint, recommendations, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP) ON CONFLICT (user_id) DO UPDATE SET fingerprint = excluded.fingerprint, recommendations = excluded.recommendations, updated_at = excluded.updated_at', (user_id, fp, json.dumps(recommendations)))
+    conn.commit()
+
+
+class RecommendationCache:
+    """
+    `load_inputs(conn, user_id)` returns (semester, weak_areas) and `generate(weak_areas, semester)`
+    returns a list of recommendations or None; `connection` is a context manager factory.
+    `allow(user_id)`, if given, is asked before every model call; a refusal leaves the stored result as is.
+    Reads never write: a cohort hit is copied to the user's row by the background worker.
+    """
+
+    def __init__(self, connection, load_inputs, generate, allow=None):
+        self.connection = connection
+        self.load_inputs = load_inputs
+        self.generate = generate
+        self.allow = allow
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._retry = {}    # user_id -> (consecutive failures, monotonic time before which refreshes are skipped)
+        self._pruned_at = time.monotonic()
+        # hits/cohort_hits/misses count reads; the rest count background refreshes (cohort_copied: a shared result stored for the user)
+        self.stats = {'hits': 0, 'cohort_hits': 0, 'misses': 0, 'unchanged': 0, 'cohort_copied': 0, 'generated': 0, 'failed': 0, 'limited': 0, 'backed_off': 0}
+
+    def _count(self, name):
+        with self._lock: self.stats[name] += 1
+
+    def get(self, conn, user_id, fp):
+        """Stored recommendations for `fp`, or None (the caller falls back and requests a refresh)"""
+        row = _user_row(conn, user_id)
+        if row and row['fingerprint'] == fp:
+            self._count('hits')
+            return json.loads(row['recommendations'])
+        shared = _cohort(conn, fp)
+        if shared is not None:
+            self._count('cohort_hits')
+            self.request_refresh(user_id)
+            return shared
+        self._count('misses')
+        return None
+
+    def request_refresh(self, user_id):
+        """
+        Queues a background recompute. Repeated requests for a queued user collapse into one, and
+        a user whose last refresh failed or was rate-limited is not retried until the backoff ends.
+        """
+        with self._lock:
+            if user_id in self._pending: return False
+            retry = self._retry.get(user_id)
+            if retry and time.monotonic() < retry[1]:
+                self.stats['backed_off'] += 1
+                return False
+            self._pending.add(user_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='recommendations-refresh', daemon=True)
+                self._thread.start()
+        self._queue.put(user_id)
+        return True
+
+    def refresh(self, conn, user_id):
+        """Recomputes one user's recommendations if their fingerprint moved; the model is the last resort"""
+        semester, weak_areas = self.load_inputs(conn, user_id)
+        fp = fingerprint(semester, weak_areas)
+        if fp is None: return
+        row = _user_row(conn, user_id)
+        if row and row['fingerprint'] == fp:
+            self._count('unchanged')
+            return
+        shared = _cohort(conn, fp)
+        if shared is None:
+            if self.allow and not self.allow(user_id):
+                self._back_off(user_id, 'limited')
+                return
+            shared = self.generate(weak_areas, semester)
+            if not shared:
+                self._back_off(user_id, 'failed')
+                return
+            self._count('generated')
+            conn.execute('INSERT OR REPLACE INTO cohort_recommendations (fingerprint, recommendations) VALUES (?, ?)', (fp, json.dumps(shared)))
+        else:
+            self._count('cohort_copied')
+        _store_user(conn, user_id, fp, shared)
+        with self._lock: self._retry.pop(user_id, None)
+
+    def _back_off(self, user_id, reason):
+        now = time.monotonic()
+        with self._lock:
+            self.stats[reason] += 1
+            self._prune(now)
+            failures = self._retry.get(user_id, (0, 0))[0] + 1
+            self._retry[user_id] = (failures, now + min(MAX_RETRY_AFTER, RETRY_AFTER * 2 ** (failures - 1)))
+
+    def _prune(self, now):
+        # Called with the lock held, at most every RETRY_AFTER seconds. An entry whose backoff ended more
+        # than MAX_RETRY_AFTER ago belongs to a user who stopped failing (or left), so its count can restart.
+        if now - self._pruned_at < RETRY_AFTER: return
+        self._pruned_at = now
+        self._retry = {u: r for u, r in self._retry.items() if r[1] + MAX_RETRY_AFTER > now}
+
+    def _run(self):
+        while True:
+            user_id = self._queue.get()
+            # Leave the pending set first so a submit arriving mid-refresh queues another pass
+            with self._lock: self._pending.discard(user_id)
+            try:
+                with self.connection() as conn: self.refresh(conn, user_id)
+            except Exception as e:
+                log.error('Recommendation refresh failed for user %s: %s', user_id, e)
+                self._back_off(user_id, 'failed')
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        self._queue.join()
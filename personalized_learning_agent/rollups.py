@@ -0,0 +1,99 @@
+"""
+Progress Rollups - per-user aggregates maintained incrementally on write
+Dashboard reads (profile, subjects, analytics) become single indexed lookups
+instead of COUNT(DISTINCT ...) joins over user_progress and quiz_results.
+"""
+
+from contextlib import contextmanager
+
+TABLES = [
+    '''CREATE TABLE IF NOT EXISTS user_subject_rollups (user_id INTEGER NOT NULL, subject_id INTEGER NOT NULL, semester INTEGER NOT NULL, completed INTEGER NOT NULL DEFAULT 0, scored_count INTEGER NOT NULL DEFAULT 0, score_sum REAL NOT NULL DEFAULT 0, PRIMARY KEY (user_id, subject_id))''',
+    '''CREATE TABLE IF NOT EXISTS user_semester_rollups (user_id INTEGER NOT NULL, semester INTEGER NOT NULL, completed INTEGER NOT NULL DEFAULT 0, completed_score_sum REAL NOT NULL DEFAULT 0, completed_time INTEGER NOT NULL DEFAULT 0, time_spent INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, semester))''',
+    '''CREATE TABLE IF NOT EXISTS user_quiz_days (user_id INTEGER NOT NULL, semester INTEGER NOT NULL, date TEXT NOT NULL, quizzes INTEGER NOT NULL DEFAULT 0, score_sum REAL NOT NULL DEFAULT 0, PRIMARY KEY (user_id, semester, date))''',
+]
+
+# Rollups recomputed from the raw tables; used to backfill, rebuild and verify
+EXPECTED = {
+    'user_subject_rollups': (('user_id', 'subject_id'), '''SELECT up.user_id, t.subject_id, s.semester, SUM(up.completion_status = 'completed') as completed, SUM(up.score > 0) as scored_count, SUM(CASE WHEN up.score > 0 THEN up.score ELSE 0 END) as score_sum FROM user_progress up JOIN topics t ON up.topic_id = t.id JOIN subjects s ON t.subject_id = s.id GROUP BY up.user_id, t.subject_id'''),
+    'user_semester_rollups': (('user_id', 'semester'), '''SELECT up.user_id, s.semester, SUM(up.completion_status = 'completed') as completed, SUM(CASE WHEN up.completion_status = 'completed' THEN up.score ELSE 0 END) as completed_score_sum, SUM(CASE WHEN up.completion_status = 'completed' THEN up.time_spent ELSE 0 END) as completed_time, SUM(up.time_spent) as time_spent FROM user_progress up JOIN topics t ON up.topic_id = t.id JOIN subjects s ON t.subject_id = s.id GROUP BY up.user_id, s.semester'''),
+    'user_quiz_days': (('user_id', 'semester', 'date'), '''SELECT qr.user_id, s.semester, DATE(qr.completed_at) as date, COUNT(*) as quizzes, SUM(qr.score) as score_sum FROM quiz_results qr JOIN topics t ON qr.topic_id = t.id JOIN subjects s ON t.subject_id = s.id GROUP BY qr.user_id, s.semester, DATE(qr.completed_at)'''),
+}
+
+REBUILD_SQL = [stmt for table, (_, select) in EXPECTED.items() for stmt in (f'DELETE FROM {table}', f'INSERT INTO {table} {select}')]
+
+
+def _contribution(row):
+    """What one user_progress row adds to its subject and semester rollups"""
+    if row is None: return (0, 0, 0.0, 0.0, 0, 0)
+    completed = row['completion_status'] == 'completed'
+    score, time_spent = row['score'] or 0, row['time_spent'] or 0
+    return (int(completed), int(score > 0), score if score > 0 else 0.0, score if completed else 0.0, time_spent if completed else 0, time_spent)
+
+
+def _read_progress(conn, user_id, topic_id):
+    return conn.execute('SELECT completion_status, score, time_spent FROM user_progress WHERE user_id = ? AND topic_id = ?', (user_id, topic_id)).fetchone()
+
+
+@contextmanager
+def tracking(conn, user_id, topic_id):
+    """
+    Wrap a write to one user_progress row; the rollups get the before/after delta
+    in the same transaction. The caller commits.
+    """
+    with tracking_many(conn, [(user_id, topic_id)]): yield
+
+
+@contextmanager
+def tracking_many(conn, keys):
+    """tracking() for a batch of (user_id, topic_id) writes: deltas are summed per rollup row and applied with executemany"""
+    # Take the write lock before reading so a concurrent writer can't slip in between
+    if not conn.in_transaction: conn.execute('BEGIN IMMEDIATE')
+    keys = list(dict.fromkeys(keys))
+    before = {key: _contribution(_read_progress(conn, *key)) for key in keys}
+    yield
+    subject_rows, semester_rows = {}, {}
+    for user_id, topic_id in keys:
+        after = _contribution(_read_progress(conn, user_id, topic_id))
+        delta = [a - b for a, b in zip(after, before[(user_id, topic_id)])]
+        if not any(delta): continue
+        topic = conn.execute('SELECT t.subject_id, s.semester FROM topics t JOIN subjects s ON t.subject_id = s.id WHERE t.id = ?', (topic_id,)).fetchone()
+        if not topic: continue
+        completed, scored, score_sum, completed_score, completed_time, time_spent = delta
+        row = subject_rows.setdefault((user_id, topic['subject_id']), [user_id, topic['subject_id'], topic['semester'], 0, 0, 0.0])
+        row[3:] = [row[3] + completed, row[4] + scored, row[5] + score_sum]
+        row = semester_rows.setdefault((user_id, topic['semester']), [user_id, topic['semester'], 0, 0.0, 0, 0])
+        row[2:] = [row[2] + completed, row[3] + completed_score, row[4] + completed_time, row[5] + time_spent]
+    conn.executemany('INSERT INTO user_subject_rollups (user_id, subject_id, semester, completed, scored_count, score_sum) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, subject_id) DO UPDATE SET completed = completed + excluded.completed, scored_count = scored_count + excluded.scored_count, score_sum = score_sum + excluded.score_sum', list(subject_rows.values()))
+    conn.executemany('INSERT INTO user_semester_rollups (user_id, semester, completed, completed_score_sum, completed_time, time_spent) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, semester) DO UPDATE SET completed = completed + excluded.completed, completed_score_sum = completed_score_sum + excluded.completed_score_sum, completed_time = completed_time + excluded.completed_time, time_spent = time_spent + excluded.time_spent', list(semester_rows.values()))
+
+
+def record_quiz(conn, quiz_result_id):
+    """Adds a freshly inserted quiz_results row to the daily trend rollup. The caller commits."""
+    conn.execute('''INSERT INTO user_quiz_days (user_id, semester, date, quizzes, score_sum) SELECT qr.user_id, s.semester, DATE(qr.completed_at), 1, qr.score FROM quiz_results qr JOIN topics t ON qr.topic_id = t.id JOIN subjects s ON t.subject_id = s.id WHERE qr.id = ? ON CONFLICT (user_id, semester, date) DO UPDATE SET quizzes = quizzes + excluded.quizzes, score_sum = score_sum + excluded.score_sum''', (quiz_result_id,))
+
+
+def rebuild(conn):
+    """Recomputes every rollup from user_progress/quiz_results in one transaction"""
+    conn.execute('BEGIN')
+    try:
+        for sql in REBUILD_SQL: conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def verify(conn, tolerance=1e-6):
+    """Returns [(table, key, expected, stored)] for every rollup row that drifted from the raw data"""
+    drift = []
+    for table, (key_cols, select) in EXPECTED.items():
+        expected = {tuple(r[c] for c in key_cols): dict(r) for r in conn.execute(select)}
+        stored = {tuple(r[c] for c in key_cols): dict(r) for r in conn.execute(f'SELECT * FROM {table}')}
+        metrics = [d[0] for d in conn.execute(f'SELECT * FROM {table} LIMIT 0').description if d[0] not in key_cols and d[0] != 'semester']
+        for key in expected.keys() | stored.keys():
+            exp = [(expected[key][c] or 0) if key in expected else 0 for c in metrics]
+            got = [(stored[key][c] or 0) if key in stored else 0 for c in metrics]
+            # A missing row and a row of zeros are equivalent
+            if any(abs(e - g) > tolerance for e, g in zip(exp, got)):
+                drift.append((table, key, expected.get(key), stored.get(key)))
+    return drift
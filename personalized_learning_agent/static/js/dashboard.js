@@ -6,9 +6,9 @@ let charts = {};
 
 // ==================== INITIALIZATION ====================
 document.addEventListener('DOMContentLoaded', () => {
-    loadUserProfile();
+    loadDashboard();
     initializeCharts();
-    // Note: loadSubjects will be called after profile loads to get correct semester
+    // Note: one bootstrap request replaces the profile -> subjects/analytics/recommendations/bookmarks waterfall
     
     // Set default active section safely
     showSection('overview');
@@ -38,27 +38,42 @@ function hideLoading() {
     if(loader) loader.classList.remove('show');
 }
 
-// ==================== USER PROFILE ====================
-async function loadUserProfile() {
+// ==================== DASHBOARD BOOTSTRAP ====================
+async function loadDashboard() {
     try {
-        const response = await fetch('/api/profile');
-        if (response.ok) {
-            const profile = await response.json();
-            currentUser = profile;
-            updateProfileUI(profile);
-            
-            // Load initial data after profile is set
-            loadSubjects(); 
-            loadRecommendations();
-            loadBookmarks();
-        } else {
-            console.error('Failed to load profile');
+        const response = await fetch('/api/dashboard/bootstrap');
+        if (!response.ok) {
+            console.error('Failed to load dashboard');
+            return;
         }
+        const data = await response.json();
+        currentUser = data.profile;
+        updateProfileUI(data.profile);
+
+        currentSubjects = data.subjects;
+        displaySubjects(data.subjects);
+        updateAnalyticsCharts(data.analytics);
+        updateSemesterStats(data.analytics.semester_stats);
+        displayBookmarks(data.bookmarks);
+
+        // Weak areas render now; AI suggestions arrive later without blocking the page
+        displayRecommendations({ weak_areas: data.weak_areas, next_topics: data.next_topics, recommendations: [] });
+        loadDeferredRecommendations(data.deferred.recommendations);
     } catch (error) {
-        console.error('Error loading profile:', error);
+        console.error('Error loading dashboard:', error);
     }
 }
 
+async function loadDeferredRecommendations(url) {
+    try {
+        const response = await fetch(url);
+        if (response.ok) displayRecommendations(await response.json());
+    } catch (error) {
+        console.error('Error loading recommendations:', error);
+    }
+}
+
+// ==================== USER PROFILE ====================
 function updateProfileUI(profile) {
     document.getElementById('userName').textContent = profile.username;
     document.getElementById('welcomeName').textContent = profile.username;
@@ -567,30 +582,52 @@ let currentQuestionIndex = 0;
 let userAnswers = [];
 let quizTimer = null;
 let quizStartTime = 0;
+let quizStream = null;
 
-async function startQuiz(topicId) {
+// Questions arrive one SSE event at a time; the first is shown as soon as it exists
+function startQuiz(topicId) {
     showLoading();
     showToast('Generative AI is creating your quiz...', 'info'); // UI Feedback for AI Delay
     closeModal();
+    if (quizStream) quizStream.close();
     
-    try {
-        const response = await fetch(`/api/quiz/${topicId}`);
-        if (!response.ok) throw new Error('Quiz failed to load');
-        
-        currentQuiz = await response.json();
-        
-        showSection('quiz');
+    currentQuiz = null;
+    quizStream = new EventSource(`/api/quiz/${topicId}/stream`);
+    
+    quizStream.addEventListener('meta', (e) => {
+        currentQuiz = { ...JSON.parse(e.data), questions: [] };
         currentQuestionIndex = 0;
-        userAnswers = new Array(currentQuiz.questions.length).fill(null);
-        quizStartTime = Date.now();
-        renderQuizQuestion();
-        
-    } catch (error) {
-        console.error('Error starting quiz:', error);
-        showToast('Failed to generate quiz. Please try again.', 'error');
-    } finally {
+        userAnswers = new Array(currentQuiz.total).fill(null);
+    });
+    
+    quizStream.addEventListener('question', (e) => {
+        if (!currentQuiz) return;
+        currentQuiz.questions.push(JSON.parse(e.data));
+        if (currentQuiz.questions.length === 1) {
+            hideLoading();
+            showSection('quiz');
+            quizStartTime = Date.now();
+            renderQuizQuestion();
+        } else if (currentQuiz.questions.length === currentQuestionIndex + 1) {
+            renderQuizQuestion(); // the student was waiting on this one
+        }
+    });
+    
+    quizStream.addEventListener('done', (e) => {
+        if (currentQuiz) currentQuiz.total = JSON.parse(e.data).total;
+        quizStream.close();
+        quizStream = null;
+    });
+    
+    quizStream.onerror = () => {
+        quizStream.close();
+        quizStream = null;
         hideLoading();
-    }
+        if (!currentQuiz || !currentQuiz.questions.length) {
+            console.error('Error starting quiz: stream failed');
+            showToast('Failed to generate quiz. Please try again.', 'error');
+        }
+    };
 }
 
 function renderQuizQuestion() {
@@ -598,18 +635,20 @@ function renderQuizQuestion() {
     if(!container || !currentQuiz) return;
 
     const question = currentQuiz.questions[currentQuestionIndex];
+    const total = currentQuiz.total;
     
     container.innerHTML = `
         <div class="quiz-header">
             <h2>${currentQuiz.topic_name}</h2>
             <div class="quiz-meta">
-                <span>Q ${currentQuestionIndex + 1} / ${currentQuiz.questions.length}</span>
+                <span>Q ${currentQuestionIndex + 1} / ${total}</span>
                 <span id="quizTimer">00:00</span>
             </div>
         </div>
         <div class="quiz-progress">
-            <div class="progress-bar"><div class="progress-fill" style="width: ${(currentQuestionIndex/currentQuiz.questions.length)*100}%"></div></div>
+            <div class="progress-bar"><div class="progress-fill" style="width: ${(currentQuestionIndex/total)*100}%"></div></div>
         </div>
+        ${!question ? '<div class="quiz-question"><p>Generating the next question...</p></div>' : `
         <div class="quiz-question">
             <h3>${question.question}</h3>
             <div class="quiz-options">
@@ -621,11 +660,11 @@ function renderQuizQuestion() {
                     </button>
                 `).join('')}
             </div>
-        </div>
+        </div>`}
         <div class="quiz-actions">
             ${currentQuestionIndex > 0 ? `<button onclick="prevQuestion()" class="btn">Previous</button>` : '<div></div>'}
             <button onclick="nextQuestion()" class="btn btn-primary" id="nextBtn" ${!userAnswers[currentQuestionIndex] ? 'disabled' : ''}>
-                ${currentQuestionIndex === currentQuiz.questions.length - 1 ? 'Submit' : 'Next'}
+                ${currentQuestionIndex === total - 1 ? 'Submit' : 'Next'}
             </button>
         </div>
     `;
@@ -655,7 +694,7 @@ window.selectOption = (idx) => {
 };
 
 window.nextQuestion = () => {
-    if (currentQuestionIndex < currentQuiz.questions.length - 1) {
+    if (currentQuestionIndex < currentQuiz.total - 1) {
         currentQuestionIndex++;
         renderQuizQuestion();
     } else {